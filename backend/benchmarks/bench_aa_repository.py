@@ -0,0 +1,95 @@
+"""
+AA repository lookup latency at scale
+
+Fills a temporary SQLite database with synthetic users (two policies and one
+account each), then measures get_user latency for random ids with the
+read-through cache disabled (every lookup hits SQLite) and enabled with a
+hot working set, plus a policy-type filter that uses idx_policies_type.
+
+Usage (from backend/):
+    python benchmarks/bench_aa_repository.py [--users 1000000] [--lookups 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.insurance import AAData, InsurancePolicy, Profile  # noqa: E402
+from services.aa_repository import AARepository  # noqa: E402
+
+CITIES = ["mumbai", "delhi", "bengaluru", "chennai", "pune", "kolkata"]
+POLICY_TYPES = ["health", "life", "vehicle", "home", "travel"]
+
+
+def _synthetic_users(start: int, count: int, rng: random.Random):
+    for i in range(start, start + count):
+        yield AAData(
+            user_id=f"user{i:08d}",
+            profile=Profile(age=rng.randint(21, 65), dependents=rng.randint(0, 4),
+                            income=rng.randint(200000, 5000000), city=rng.choice(CITIES)),
+            insurances=[InsurancePolicy(type=t, coverage=rng.randint(1, 100) * 100000,
+                                        premium=rng.randint(3000, 40000), provider="provider")
+                        for t in rng.sample(POLICY_TYPES, 2)],
+            accounts=[{"type": "savings", "balance": rng.randint(0, 1000000)}]
+        )
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000  # noqa: E731
+    return f"p50 {pick(0.50):7.1f} us   p99 {pick(0.99):7.1f} us   mean {sum(samples) / len(samples) * 1000:7.1f} us"
+
+
+def _measure(fn, ids):
+    samples = []
+    for user_id in ids:
+        start = time.perf_counter()
+        fn(user_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        repo = AARepository(url, cache_size=0, seed=False)
+
+        start = time.perf_counter()
+        for offset in range(0, args.users, args.batch):
+            repo.upsert_users(_synthetic_users(offset, min(args.batch, args.users - offset), rng))
+        size_mb = os.path.getsize(os.path.join(tmp, "bench.db")) / 1e6
+        print(f"Inserted {repo.count_users():,} users in {time.perf_counter() - start:.1f} s ({size_mb:.0f} MB)")
+
+        ids = [f"user{rng.randrange(args.users):08d}" for _ in range(args.lookups)]
+        print(f"get_user, no cache:     {_percentiles(_measure(repo.get_user, ids))}")
+
+        cached = AARepository(url, cache_size=10000, cache_ttl=300, seed=False)
+        hot = [f"user{rng.randrange(args.users):08d}" for _ in range(1000)]
+        hot_ids = [rng.choice(hot) for _ in range(args.lookups)]
+        print(f"get_user, hot cache:    {_percentiles(_measure(cached.get_user, hot_ids))}")
+
+        with repo.connection() as conn:
+            start = time.perf_counter()
+            count = conn.execute("SELECT COUNT(*) FROM policies WHERE type = ?", ("health",)).fetchone()[0]
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM policies WHERE type = ?",
+                                ("health",)).fetchall()
+            print(f"policies of type health: {count:,} in {(time.perf_counter() - start) * 1000:.1f} ms "
+                  f"({plan[0][-1]})")
+        repo.close()
+        cached.close()
+
+
+if __name__ == "__main__":
+    main()
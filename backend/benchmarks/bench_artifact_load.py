@@ -0,0 +1,126 @@
+"""
+Load time and per-worker memory: pickle vs memory-mapped artifact
+
+Builds a synthetic model with large arrays, saves it both as a classic pickle
+and as a memory-mapped artifact, then starts N worker processes for each
+format. Every worker loads the model, touches all of its arrays (as scoring
+would) and reports its load time plus RSS split into anonymous (private)
+and file-backed (shareable) memory, and PSS (RSS with shared pages divided
+among the processes sharing them).
+
+Usage (from backend/):
+    python benchmarks/bench_artifact_load.py [--workers 4] [--model-mb 200]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.artifact_format import load_artifact, save_artifact  # noqa: E402
+
+
+def _memory_kb():
+    stats = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                key, value = line.split(":")
+                stats[key] = int(value.split()[0])
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                stats["Pss"] = int(line.split()[1])
+    return stats
+
+
+def _touch(obj):
+    total = 0.0
+    for value in obj["model"].values():
+        total += float(np.asarray(value).sum())
+    return total
+
+
+def _worker(fmt, path, barrier, results):
+    baseline = _memory_kb()
+    start = time.perf_counter()
+    if fmt == "pickle":
+        with open(path, "rb") as f:
+            obj = pickle.load(f)
+    else:
+        obj, _ = load_artifact(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    _touch(obj)
+    ready_ms = (time.perf_counter() - start) * 1000
+
+    # Measure while every worker is alive so shared pages are split between them
+    barrier.wait()
+    memory = _memory_kb()
+    results.put({
+        "load_ms": load_ms,
+        "ready_ms": ready_ms,
+        "rss_anon_mb": (memory["RssAnon"] - baseline["RssAnon"]) / 1024,
+        "rss_file_mb": (memory["RssFile"] - baseline["RssFile"]) / 1024,
+        "pss_mb": (memory["Pss"] - baseline["Pss"]) / 1024,
+    })
+    barrier.wait()
+
+
+def _run(fmt, path, workers):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(fmt, path, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def _synthetic_model(model_mb):
+    rng = np.random.default_rng(0)
+    n = int(model_mb * 1024 * 1024 / 8 / 2)
+    return {
+        "model": {"node_thresholds": rng.random(n), "node_values": rng.random(n)},
+        "scaler": None,
+        "features": ["f%d" % i for i in range(10)],
+        "model_type": "Synthetic",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model-mb", type=float, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_data = _synthetic_model(args.model_mb)
+        pickle_path = os.path.join(tmp, "model.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        artifact_path = os.path.join(tmp, "model_artifact")
+        save_artifact(model_data, artifact_path)
+        del model_data
+
+        print(f"{args.workers} workers, {args.model_mb:.0f} MB of model arrays\n")
+        print(f"{'format':8} {'load ms':>9} {'ready ms':>9} {'anon MB':>9} {'file MB':>9} {'PSS MB':>9}")
+        for fmt, path in (("pickle", pickle_path), ("mmap", artifact_path)):
+            rows = _run(fmt, path, args.workers)
+            avg = {k: sum(r[k] for r in rows) / len(rows) for k in rows[0]}
+            print(f"{fmt:8} {avg['load_ms']:9.1f} {avg['ready_ms']:9.1f} {avg['rss_anon_mb']:9.1f} "
+                  f"{avg['rss_file_mb']:9.1f} {avg['pss_mb']:9.1f}")
+        print("\n(per-worker averages; PSS counts shared pages once across all workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+LLM call latency under a misbehaving upstream: deadlines, circuit breaker and hedging
+
+Drives services.llm_client.LLMClient with a scripted upstream (healthy,
+heavy-tailed, slow, failing, flapping) and a fixed number of concurrent
+callers, each with a request deadline, and reports p50/p99/max latency,
+how many calls got an LLM answer vs. fell back, and how many upstream
+requests were sent, with and without hedging.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_resilience.py [--calls 400] [--concurrency 32] [--deadline 2]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from services.llm_client import CircuitBreaker, LLMClient, LLMError, deadline_after  # noqa: E402
+
+
+class ScriptedUpstream:
+    """Upstream whose latency and failures follow a scenario"""
+
+    model_name = "scripted"
+
+    def __init__(self, latency=0.08, tail=0.0, tail_latency=5.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.tail = tail
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.model = self
+        self.requests = 0
+        self._rng = random.Random(seed)
+
+    async def generate(self, prompt, timeout):
+        self.requests += 1
+        slow = self._rng.random() < self.tail
+        await asyncio.sleep(self.tail_latency if slow else self.latency * self._rng.uniform(0.5, 1.5))
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("upstream 503")
+        return f"reply to {prompt}"
+
+
+SCENARIOS = [
+    ("healthy", dict()),
+    ("heavy tail (5% take 5s)", dict(tail=0.05)),
+    ("slow (every call 10s)", dict(latency=10.0)),
+    ("failing (100% errors)", dict(error_rate=1.0)),
+    ("flaky (30% errors)", dict(error_rate=0.3)),
+]
+
+
+async def run(upstream, calls, concurrency, deadline, hedge_after):
+    client = LLMClient(upstream, max_concurrency=concurrency, hedge_after=hedge_after,
+                       breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1.0))
+    latencies, answered = [], 0
+    counter = iter(range(calls))
+
+    async def caller():
+        nonlocal answered
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await client.generate(f"question {i}", deadline=deadline_after(deadline))
+                answered += 1
+            except LLMError:
+                pass  # the endpoint would answer from its rule-based fallback here
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    p50, p99 = np.percentile(latencies, [50, 99]).tolist()
+    return p50 * 1000, p99 * 1000, max(latencies) * 1000, answered, upstream.requests
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--deadline", type=float, default=2.0, help="per-call deadline in seconds")
+    parser.add_argument("--hedge-after", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls, {args.concurrency} concurrent, {args.deadline:g}s deadline")
+    print(f"{'upstream':26} {'hedge':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'answered':>9} {'upstream':>9}")
+    for name, scenario in SCENARIOS:
+        for hedge_after in (0.0, args.hedge_after):
+            p50, p99, worst, answered, requests = await run(
+                ScriptedUpstream(**scenario), args.calls, args.concurrency, args.deadline, hedge_after)
+            print(f"{name:26} {hedge_after or '-':>6} {p50:8.1f} {p99:8.1f} {worst:8.1f} "
+                  f"{answered:9d} {requests:9d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Repayment plan search: closed-form vectorized simulation vs a month-by-month loop
+
+Checks core.planner_engine.simulate against a plain month-by-month
+amortization loop on random loan portfolios (payoff month and total
+interest), then times a full create_plan search and the same candidates
+simulated one at a time with the loop.
+
+Usage (from backend/):
+    python benchmarks/bench_planner.py [--cases 300] [--repeat 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.planner_engine import MAX_MONTHS, _priorities, create_plan, emi, simulate  # noqa: E402
+
+LOANS = [
+    {"balance": 300000, "annual_rate": 18, "remaining_months": 36},
+    {"balance": 80000, "annual_rate": 36, "emi": 4000},
+    {"balance": 500000, "annual_rate": 9, "remaining_months": 120},
+]
+
+
+def month_by_month(balance, annual_rate, min_payment, extra, avalanche):
+    """Reference: pay every loan each month, rolling freed payments into the top-priority loan"""
+    balance = list(balance)
+    rate = [r / 1200 for r in annual_rate]
+    order = sorted(range(len(balance)), key=(lambda i: -annual_rate[i]) if avalanche else (lambda i: balance[i]))
+    payment = list(min_payment)
+    active = [b > 0 for b in balance]
+    payment[next(i for i in order if active[i])] += extra
+    months, paid = 0, 0.0
+    while any(active) and months < MAX_MONTHS:
+        months += 1
+        freed = 0.0
+        for i in range(len(balance)):
+            if not active[i]:
+                continue
+            due = balance[i] * (1 + rate[i])
+            amount = min(payment[i], due)
+            paid += amount
+            balance[i] = due - amount
+            if balance[i] <= 1e-6:
+                active[i] = False
+                freed += payment[i]
+        if freed and any(active):
+            payment[next(i for i in order if active[i])] += freed
+    return paid, months
+
+
+def _random_case(rng):
+    n = int(rng.integers(1, 5))
+    balance = rng.uniform(1e4, 5e5, n)
+    rate = rng.choice([0, 6, 9, 12, 18, 24, 36], n).astype(float)
+    payment = emi(balance, rate, rng.integers(12, 120, n))
+    return balance, rate, payment, float(rng.uniform(0, 20000)), int(rng.integers(0, 2))
+
+
+def _time(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    month_mismatches, max_error = 0, 0.0
+    for _ in range(args.cases):
+        balance, rate, payment, extra, ordering = _random_case(rng)
+        result = simulate(balance[None], rate[None], payment[None], np.array([extra]),
+                          _priorities(balance[None], rate[None], np.array([ordering])))
+        paid, months = month_by_month(balance, rate, payment, extra, ordering == 0)
+        interest = paid - balance.sum()
+        month_mismatches += int(result["months"][0]) != months
+        max_error = max(max_error, abs(float(result["interest"][0]) - interest) / max(1.0, interest))
+    print(f"{args.cases} random portfolios: {month_mismatches} payoff-month mismatches, "
+          f"max relative interest error {max_error:.1e}")
+
+    for name, loans in (("new loan only", []), ("3 loans + new loan", LOANS)):
+        plan = create_plan(120000, 50000, 720, loans, {"amount": 2500000}, include_schedule=False)
+        n = plan["candidates_evaluated"]
+        vectorized = _time(lambda: create_plan(120000, 50000, 720, loans, {"amount": 2500000},
+                                               include_schedule=False), args.repeat)
+        with_schedule = _time(lambda: create_plan(120000, 50000, 720, loans, {"amount": 2500000}), args.repeat)
+
+        # The same candidate grid, one month-by-month loop per candidate
+        balance = [loan["balance"] for loan in loans] + [2500000]
+        rate = [loan["annual_rate"] for loan in loans] + [plan["new_loan"]["annual_rate"]]
+        payment = [float(emi(loan["balance"], loan["annual_rate"], loan.get("remaining_months") or 60))
+                   if not loan.get("emi") else loan["emi"] for loan in loans] + [plan["new_loan"]["emi"]]
+        start = time.perf_counter()
+        for i in range(n):
+            month_by_month(balance, rate, payment, plan["monthly_prepayment"] * (i % 11) / 10, i % 2 == 0)
+        loop = (time.perf_counter() - start) * 1000
+
+        print(f"{name:20} {n:5d} candidates: vectorized {vectorized:6.2f} ms "
+              f"(+schedule {with_schedule:6.2f} ms), month loop {loop:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
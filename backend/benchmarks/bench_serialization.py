@@ -0,0 +1,82 @@
+"""
+Per-endpoint latency and allocations of the JSON response path
+
+Runs the app in-process (fake LLM, in-memory SQLite, micro-batching window
+off so /predict isn't dominated by the batch wait) and issues sequential
+requests through httpx's ASGI transport. For each endpoint it reports mean
+and p50 latency plus the mean tracemalloc peak per request, i.e. the
+transient memory needed to build and serialize one response.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--requests 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("PREDICT_BATCH_WINDOW_MS", "0")
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+
+PROFILE = {"age": 32, "monthly_income": 85000, "current_credit_score": 710, "total_debt": 250000,
+           "employment_years": 6, "loan_amount": 500000, "loan_tenure_months": 60,
+           "existing_loans_count": 1, "credit_utilization": 35, "payment_history_score": 88}
+
+ENDPOINTS = [
+    ("POST /api/credit/predict", "POST", "/api/credit/predict", {"json": PROFILE}),
+    ("POST /api/credit/predict-batch (100)", "POST", "/api/credit/predict-batch",
+     {"json": {"profiles": [dict(PROFILE, monthly_income=40000 + i * 500) for i in range(100)]}}),
+    ("GET /api/credit/transactions/user1", "GET", "/api/credit/transactions/user1", {}),
+    ("GET /api/insurance/user/user1", "GET", "/api/insurance/user/user1", {}),
+    ("GET /api/insurance/advice", "GET", "/api/insurance/advice", {"params": {"user_id": "user1"}}),
+]
+
+
+async def _bench(client, method, path, kwargs, requests):
+    for _ in range(20):
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await client.request(method, path, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(requests, 100)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await client.request(method, path, **kwargs)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[len(latencies) // 2], sum(peaks) / len(peaks) / 1024
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':40} {'mean ms':>8} {'p50 ms':>8} {'peak KB/req':>12}")
+        for name, method, path, kwargs in ENDPOINTS:
+            mean, p50, peak_kb = await _bench(client, method, path, kwargs, args.requests)
+            print(f"{name:40} {mean:8.3f} {p50:8.3f} {peak_kb:12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Latency of compiled flat-array forests vs the native estimators
+
+Trains a few tree ensembles on synthetic 10-feature credit data, compiles
+them with models.tree_compiler, checks that the predictions match, and
+times single-row and batch prediction for both.
+
+Usage (from backend/):
+    python benchmarks/bench_tree_compiler.py [--batch 10000] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.tree_compiler import compile_tree_ensemble, verify_compiled  # noqa: E402
+
+
+def _synthetic_credit_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(21, 65, n), rng.uniform(1e4, 2e5, n), rng.integers(300, 850, n), rng.uniform(0, 5, n),
+        rng.integers(0, 30, n), rng.uniform(1e4, 1e7, n), rng.integers(6, 240, n), rng.integers(0, 5, n),
+        rng.uniform(0, 1, n), rng.uniform(0, 1, n),
+    ]).astype(np.float64)
+    y = np.clip(X[:, 2] + 60 * (X[:, 9] - 0.5) - 25 * X[:, 3] - 40 * X[:, 8], 300, 850)
+    return X, y
+
+
+def _models():
+    from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, RandomForestRegressor
+
+    models = [
+        ("RandomForestRegressor(100, depth 10)", RandomForestRegressor(100, max_depth=10, random_state=0), False),
+        ("GradientBoostingRegressor(200)", GradientBoostingRegressor(n_estimators=200, random_state=0), False),
+        ("GradientBoostingClassifier(200)", GradientBoostingClassifier(n_estimators=200, random_state=0), True),
+    ]
+    try:
+        import xgboost as xgb
+        models.append(("XGBRegressor(200)", xgb.XGBRegressor(n_estimators=200, max_depth=6), False))
+    except ImportError:
+        pass
+    return models
+
+
+def _time(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    X, y = _synthetic_credit_data(20000)
+    X_batch, _ = _synthetic_credit_data(args.batch, seed=1)
+    row = X_batch[:1]
+
+    print(f"{'model':40} {'max diff':>9} {'1 row native':>13} {'1 row comp':>11} "
+          f"{f'{args.batch} native':>13} {f'{args.batch} comp':>11}")
+    for name, model, classify in _models():
+        model.fit(X, (y > 650).astype(int) if classify else y)
+        compiled = compile_tree_ensemble(model)
+        max_diff = verify_compiled(model, compiled, X_batch[:2000])
+
+        native_fn = model.predict_proba if classify else model.predict
+        compiled_fn = compiled.predict_proba if classify else compiled.predict
+        batch_repeat = max(3, args.repeat // 50)
+        print(f"{name:40} {max_diff:9.1e} "
+              f"{_time(lambda: native_fn(row), args.repeat):10.3f} ms "
+              f"{_time(lambda: compiled_fn(row), args.repeat):8.3f} ms "
+              f"{_time(lambda: native_fn(X_batch), batch_repeat):10.1f} ms "
+              f"{_time(lambda: compiled_fn(X_batch), batch_repeat):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
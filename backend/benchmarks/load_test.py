@@ -0,0 +1,238 @@
+"""
+API load test: latency percentiles, throughput and memory per endpoint
+
+Boots `main.app` in-process with the deterministic fake LLM backend
+(LLM_BACKEND=fake, fixed latency), an in-memory AA database and a small
+synthetic GradientBoosting credit model, then drives every router through
+httpx's ASGI transport with a fixed number of concurrent clients. For each
+scenario it reports p50/p95/p99 latency, requests per second, errors and
+the process RSS after the run (plus the peak RSS at the end).
+
+Results can be saved as a JSON baseline and later runs compared against it,
+so a slowdown shows up both in the comparison table and as a diff of the
+committed baseline file.
+
+Usage (from backend/):
+    python benchmarks/load_test.py [--concurrency 16] [--requests 400] [--only insurance]
+    python benchmarks/load_test.py --save-baseline      # rewrite benchmarks/baselines/load_test.json
+    python benchmarks/load_test.py --compare             # exit 1 if p95 or RPS regressed
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "load_test.json")
+
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY_MS", "50")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+PROFILE = {"age": 32, "monthly_income": 85000, "current_credit_score": 710, "total_debt": 250000,
+           "employment_years": 6, "loan_amount": 500000, "loan_tenure_months": 60,
+           "existing_loans_count": 1, "credit_utilization": 35, "payment_history_score": 88}
+
+
+def _profile(i):
+    # Distinct profiles, so the analysis cache doesn't turn the run into a cache benchmark
+    return dict(PROFILE, monthly_income=40000 + (i % 5000) * 17, age=21 + i % 40)
+
+
+# (name, method, path, request kwargs for the i-th request)
+SCENARIOS = [
+    ("credit/predict", "POST", "/api/credit/predict", lambda i: {"json": _profile(i)}),
+    ("credit/predict-batch(50)", "POST", "/api/credit/predict-batch",
+     lambda i: {"json": {"profiles": [_profile(i * 50 + j) for j in range(50)]}}),
+    ("credit/genfi-analyze", "POST", "/api/credit/genfi-analyze", lambda i: {"json": _profile(i)}),
+    ("credit/analyze", "POST", "/api/credit/analyze",
+     lambda i: {"json": {"user_id": "user1", "credit_score": 700, "emi_ratio": 0.3}}),
+    ("credit/chat-analysis", "POST", "/api/credit/chat-analysis",
+     lambda i: {"params": {"question": f"How can I improve my score? ({i})"}, "json": _profile(i)}),
+    ("credit/what-if", "POST", "/api/credit/what-if",
+     lambda i: {"json": {"profile": _profile(i), "levers": {
+         "credit_utilization": {"min": 0, "max": 90, "steps": 19}, "total_debt": {"min": 0, "max": 500000, "steps": 21},
+         "employment_years": {"min": 0, "max": 10, "steps": 11}}}}),
+    ("credit/transactions GET", "GET", "/api/credit/transactions/user1", lambda i: {}),
+    ("credit/transactions POST", "POST", "/api/credit/transactions/load-user",
+     lambda i: {"json": [{"id": i, "amount": 100 + i % 900, "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                          "type": "credit" if i % 4 == 0 else "debit", "receiver": f"shop{i % 20}"}]}),
+    ("credit/aggregates", "GET", "/api/credit/aggregates/user1", lambda i: {}),
+    ("insurance/user", "GET", "/api/insurance/user/user1", lambda i: {}),
+    ("insurance/advice", "GET", "/api/insurance/advice", lambda i: {"params": {"user_id": "user1"}}),
+    ("insurance/chat", "POST", "/api/insurance/chat",
+     lambda i: {"json": {"user_id": "user1", "message": f"Do I need more life cover? ({i})"}}),
+    ("insurance/advice/bulk", "POST", "/api/insurance/advice/bulk",
+     lambda i: {"json": {"user_ids": ["user1", "missing"]}}),
+    ("explain/score", "POST", "/api/explain/score",
+     lambda i: {"json": {"score": 600 + i % 250, "emi_ratio": 0.35}}),
+    ("planner/create", "POST", "/api/planner/create",
+     lambda i: {"json": {"monthly_income": 90000, "monthly_expenses": 40000, "credit_score": 720,
+                         "loans": [{"balance": 180000, "annual_rate": 15.5, "emi": 9000},
+                                   {"balance": 60000, "annual_rate": 36, "emi": 4000}],
+                         "new_loan": {"amount": 2000000 + i}}}),
+]
+
+
+def _rss_kb():
+    """(current RSS, peak RSS) of this process in KB"""
+    stats = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":")
+                    stats[key] = int(value.split()[0])
+        return stats["VmRSS"], stats["VmHWM"]
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak // 1024 if sys.platform == "darwin" else peak
+        return peak, peak
+
+
+def train_synthetic_model(path, rows=5000, seed=0):
+    """Fit a small GradientBoosting model on synthetic 10-feature credit data and save it"""
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    from model_converter import save_model_for_production
+
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(21, 65, rows), rng.uniform(1e4, 2e5, rows), rng.integers(300, 850, rows),
+        rng.uniform(0, 5, rows), rng.integers(0, 30, rows), rng.uniform(1e4, 1e7, rows),
+        rng.integers(6, 240, rows), rng.integers(0, 5, rows), rng.uniform(0, 1, rows), rng.uniform(0, 1, rows),
+    ]).astype(np.float64)
+    y = np.clip(X[:, 2] + 60 * (X[:, 9] - 0.5) - 25 * X[:, 3] - 40 * X[:, 8], 300, 850)
+    model = GradientBoostingRegressor(n_estimators=100, max_depth=3, random_state=seed).fit(X, y)
+    return save_model_for_production(model, model_path=path)
+
+
+async def run_scenario(client, method, path, make_kwargs, requests, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            kwargs = make_kwargs(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "rss_mb": round(_rss_kb()[0] / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a baseline; return the scenarios that regressed"""
+    regressions = []
+    print(f"\n{'vs baseline':28} {'p95 ms':>18} {'rps':>18}")
+    for name, current in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:28} {'(new)':>18}")
+            continue
+        p95_change = current["p95_ms"] / max(before["p95_ms"], 1e-9) - 1
+        rps_change = current["rps"] / max(before["rps"], 1e-9) - 1
+        flag = ""
+        if p95_change > tolerance or rps_change < -tolerance:
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:28} {before['p95_ms']:7.2f} -> {current['p95_ms']:7.2f} "
+              f"{before['rps']:7.1f} -> {current['rps']:7.1f}{flag}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--only", default="", help="run scenarios whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative p95/RPS change that counts as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = train_synthetic_model(os.path.join(tmp, "synthetic_model.pkl"))
+
+        from main import app
+        from models import credit_model
+
+        credit_model.load_genfi_system(model_path)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            (await client.get("/ready")).raise_for_status()
+
+            print(f"\n{args.concurrency} concurrent clients, {args.requests} requests per scenario")
+            print(f"{'scenario':28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rps':>8} {'errors':>7} {'rss MB':>7}")
+            results = {}
+            for name, method, path, make_kwargs in SCENARIOS:
+                if args.only not in name:
+                    continue
+                r = await run_scenario(client, method, path, make_kwargs, args.requests, args.concurrency)
+                results[name] = r
+                print(f"{name:28} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+                      f"{r['rps']:8.1f} {r['errors']:7d} {r['rss_mb']:7.1f}")
+
+    peak_mb = round(_rss_kb()[1] / 1024, 1)
+    print(f"peak RSS: {peak_mb} MB")
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"⚠️  No baseline at {args.baseline}; run with --save-baseline first")
+        else:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "settings": {"concurrency": args.concurrency, "requests": args.requests,
+                             "llm_fake_latency_ms": float(os.environ["LLM_FAKE_LATENCY_MS"])},
+                "machine": {"python": platform.python_version(), "cpus": os.cpu_count()},
+                "peak_rss_mb": peak_mb,
+                "scenarios": results
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"❌ Regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,10 +12,44 @@ class Config:
     API_HOST = os.getenv('API_HOST', '0.0.0.0')
     API_PORT = int(os.getenv('API_PORT', 8000))
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 10000))
+    PREDICT_BATCH_WINDOW_MS = float(os.getenv('PREDICT_BATCH_WINDOW_MS', 3))
+    PREDICT_MICRO_BATCH_SIZE = int(os.getenv('PREDICT_MICRO_BATCH_SIZE', 32))
+    WHAT_IF_MAX_GRID_POINTS = int(os.getenv('WHAT_IF_MAX_GRID_POINTS', 50000))
+    ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 4096))
+    ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', 300))
+    MODEL_HISTORY_SIZE = int(os.getenv('MODEL_HISTORY_SIZE', 2))
+    SCORER_BACKEND = os.getenv('SCORER_BACKEND', 'compiled')
+    GENFI_EXECUTION_MODE = os.getenv('GENFI_EXECUTION_MODE', 'inline')
+    GENFI_POOL_WORKERS = int(os.getenv('GENFI_POOL_WORKERS', os.cpu_count() or 2))
+    GENFI_POOL_TASK_TIMEOUT_SECONDS = float(os.getenv('GENFI_POOL_TASK_TIMEOUT_SECONDS', 30))
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 20))
+    LLM_FAKE_LATENCY_MS = float(os.getenv('LLM_FAKE_LATENCY_MS', 200))
+    LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', 1024))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', 600))
+    LLM_DEADLINE_SECONDS = float(os.getenv('LLM_DEADLINE_SECONDS', 5))
+    LLM_MIN_CALL_SECONDS = float(os.getenv('LLM_MIN_CALL_SECONDS', 0.3))
+    LLM_HEDGE_AFTER_SECONDS = float(os.getenv('LLM_HEDGE_AFTER_SECONDS', 0))
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30))
+    CHAT_SESSION_TOKEN_BUDGET = int(os.getenv('CHAT_SESSION_TOKEN_BUDGET', 1500))
+    CHAT_SESSION_TTL_SECONDS = float(os.getenv('CHAT_SESSION_TTL_SECONDS', 3600))
+    CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 10000))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+    AA_CACHE_SIZE = int(os.getenv('AA_CACHE_SIZE', 10000))
+    AA_CACHE_TTL_SECONDS = float(os.getenv('AA_CACHE_TTL_SECONDS', 30))
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', 0))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 40))
     
     @staticmethod
     def validate():
-        if not Config.GEMINI_API_KEY:
+        if Config.LLM_BACKEND == 'gemini' and not Config.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not set in environment")
         if Config.ENVIRONMENT == 'production' and Config.JWT_SECRET == 'default_secret_key':
             raise ValueError("JWT_SECRET must be set in production")
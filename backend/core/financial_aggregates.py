@@ -0,0 +1,243 @@
+"""
+Incrementally maintained rolling financial aggregates
+
+For every user we keep 30/90/365-day windows of income, expenses and the
+daily net cash flow, updated as transactions are ingested. Each window holds
+per-day buckets in date order plus running sums (and the sum of squared daily
+net flow, for volatility); advancing the window pops expired days off the
+front and subtracts them. Ingesting a transaction in date order is O(1)
+amortized, and reading a snapshot is O(1) for an active account, so scoring
+cost no longer depends on how long the account has existed.
+
+Stored windows only advance when a newer transaction arrives. Reads are
+evaluated as of max(last transaction, today): days that have aged out since
+the last transaction are left out of the result without touching the stored
+state, so an account that went quiet shows its recent activity falling away.
+"""
+
+import math
+import threading
+from bisect import insort
+from datetime import date
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from services.aa_parser import EPOCH_ORDINAL, TXN_CREDIT
+
+WINDOWS = (30, 90, 365)
+# Window used for the monthly income/expenses handed to scoring and planning
+SCORING_WINDOW = 90
+DAYS_PER_MONTH = 30
+
+
+def _today() -> int:
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+
+class _Window:
+    __slots__ = ("days", "span", "income", "expenses", "net_sq")
+
+    def __init__(self, span: int):
+        self.span = span
+        self.days = deque()
+        self.income = 0.0
+        self.expenses = 0.0
+        self.net_sq = 0.0
+
+    def add_day(self, day: int):
+        if not self.days or day > self.days[-1]:
+            self.days.append(day)
+        else:
+            # A late transaction for a day we haven't seen yet; rare, and bounded by the span
+            items = list(self.days)
+            insort(items, day)
+            self.days = deque(items)
+
+
+class UserAggregates:
+    def __init__(self, windows: Tuple[int, ...] = WINDOWS):
+        self.spans = tuple(sorted(windows))
+        self._max_span = self.spans[-1]
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._windows = [_Window(span) for span in self.spans]
+        self._buckets: Dict[int, list] = {}  # day -> [income, expenses]
+        self.as_of: Optional[int] = None
+        self.first_day: Optional[int] = None
+
+    def ingest(self, day: int, amount: float, kind: int):
+        """Add one transaction (day = days since epoch, kind = aa_parser type code)"""
+        if self.as_of is None or day > self.as_of:
+            self._advance(day)
+        if self.first_day is None or day < self.first_day:
+            self.first_day = day
+        if day <= self.as_of - self._max_span:
+            return  # older than every window
+
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = [0.0, 0.0]
+            for window in self._windows:
+                if day > self.as_of - window.span:
+                    window.add_day(day)
+
+        old_net = bucket[0] - bucket[1]
+        income = amount if kind == TXN_CREDIT else 0.0
+        expenses = 0.0 if kind == TXN_CREDIT else amount
+        bucket[0] += income
+        bucket[1] += expenses
+        new_net = bucket[0] - bucket[1]
+
+        for window in self._windows:
+            if day > self.as_of - window.span:
+                window.income += income
+                window.expenses += expenses
+                window.net_sq += new_net * new_net - old_net * old_net
+
+    def _advance(self, as_of: int):
+        self.as_of = as_of
+        # Windows are ordered by span, so the largest one pops a day last and drops its bucket
+        for window in self._windows:
+            cutoff = as_of - window.span
+            while window.days and window.days[0] <= cutoff:
+                day = window.days.popleft()
+                income, expenses = self._buckets[day]
+                window.income -= income
+                window.expenses -= expenses
+                window.net_sq -= (income - expenses) ** 2
+                if window.span == self._max_span:
+                    del self._buckets[day]
+            if not window.days:
+                # Drop accumulated rounding error once the window is empty
+                window.income = window.expenses = window.net_sq = 0.0
+
+    def rebuild(self, day: np.ndarray, amount: np.ndarray, kind: np.ndarray):
+        """Reset from a full (columnar) history in one vectorized pass"""
+        self._reset()
+        if not len(day):
+            return
+
+        self.as_of = int(day.max())
+        self.first_day = int(day.min())
+        recent = day > self.as_of - self._max_span
+        day, amount, kind = day[recent], amount[recent], kind[recent]
+
+        days, index = np.unique(day, return_inverse=True)
+        credit = kind == TXN_CREDIT
+        income = np.bincount(index, weights=np.where(credit, amount, 0.0), minlength=len(days))
+        expenses = np.bincount(index, weights=np.where(credit, 0.0, amount), minlength=len(days))
+        net = income - expenses
+
+        self._buckets = {int(d): [float(i), float(e)] for d, i, e in zip(days, income, expenses)}
+        for window in self._windows:
+            inside = days > self.as_of - window.span
+            window.days = deque(days[inside].tolist())
+            window.income = float(income[inside].sum())
+            window.expenses = float(expenses[inside].sum())
+            window.net_sq = float((net[inside] ** 2).sum())
+
+    def read_day(self) -> Optional[int]:
+        """Day reads are evaluated at: the last transaction's day, or today if that is later"""
+        return None if self.as_of is None else max(self.as_of, _today())
+
+    def snapshot(self, as_of: Optional[int] = None) -> Dict[str, Any]:
+        """Per-window totals, expense ratio and daily net-flow volatility as of `as_of`
+
+        `as_of` defaults to today and is never earlier than the last transaction;
+        days older than a window at that point are left out, but the stored
+        windows are not changed.
+        """
+        with self.lock:
+            return self._snapshot(as_of)
+
+    def _snapshot(self, as_of: Optional[int]) -> Dict[str, Any]:
+        if self.as_of is not None:
+            as_of = max(self.as_of, _today() if as_of is None else as_of)
+        result = {}
+        for window in self._windows:
+            income, expenses, net_sq = window.income, window.expenses, window.net_sq
+            active_days = len(window.days)
+            if as_of is not None and as_of > self.as_of:
+                # Leave out the days that aged out after the last transaction
+                cutoff = as_of - window.span
+                for day in window.days:
+                    if day > cutoff:
+                        break
+                    day_income, day_expenses = self._buckets[day]
+                    income -= day_income
+                    expenses -= day_expenses
+                    net_sq -= (day_income - day_expenses) ** 2
+                    active_days -= 1
+                if not active_days:
+                    income = expenses = net_sq = 0.0
+            # Accounts younger than the window are averaged over the days they have existed
+            covered = window.span if as_of is None else min(window.span, as_of - self.first_day + 1)
+            covered = max(1, covered)
+            income = max(0.0, round(income, 2))
+            expenses = max(0.0, round(expenses, 2))
+            mean_net = (income - expenses) / covered
+            variance = max(0.0, net_sq / covered - mean_net * mean_net)
+            result[f"{window.span}d"] = {
+                "income": round(income, 2),
+                "expenses": round(expenses, 2),
+                "expense_ratio": round(expenses / income, 4) if income > 0 else None,
+                "volatility": round(math.sqrt(variance), 2),
+                "monthly_income": round(income * DAYS_PER_MONTH / max(covered, DAYS_PER_MONTH), 2),
+                "monthly_expenses": round(expenses * DAYS_PER_MONTH / max(covered, DAYS_PER_MONTH), 2),
+                "days_covered": covered,
+                "active_days": active_days
+            }
+        return result
+
+
+class AggregateStore:
+    """user_id -> UserAggregates"""
+
+    def __init__(self, windows: Tuple[int, ...] = WINDOWS):
+        self.windows = windows
+        self._users: Dict[str, UserAggregates] = {}
+        self._lock = threading.Lock()
+
+    def _user(self, user_id: str) -> UserAggregates:
+        user = self._users.get(user_id)
+        if user is None:
+            with self._lock:
+                user = self._users.setdefault(user_id, UserAggregates(self.windows))
+        return user
+
+    def get(self, user_id: str) -> Optional[UserAggregates]:
+        return self._users.get(user_id)
+
+    def ingest(self, user_id: str, rows: Iterable[Tuple[int, float, int]]):
+        """Apply (day, amount, kind) rows to the user's windows"""
+        user = self._user(user_id)
+        with user.lock:
+            for day, amount, kind in sorted(rows):
+                user.ingest(day, amount, kind)
+
+    def rebuild(self, user_id: str, day: np.ndarray, amount: np.ndarray, kind: np.ndarray):
+        user = self._user(user_id)
+        with user.lock:
+            user.rebuild(day, amount, kind)
+
+    def profile_inputs(self, user_id: str, window: int = SCORING_WINDOW,
+                       as_of: Optional[int] = None) -> Dict[str, float]:
+        """Monthly income/expenses from the scoring window, as compute_genfi_score expects
+
+        Evaluated as of max(last transaction, today) unless `as_of` is given. Empty when
+        the window holds no transactions by then, so the caller keeps its own figures.
+        """
+        user = self._users.get(user_id)
+        if user is None or user.as_of is None:
+            return {}
+        stats = user.snapshot(as_of)[f"{window}d"]
+        if not stats["active_days"]:
+            return {}
+        return {"income": stats["monthly_income"], "expenses": stats["monthly_expenses"]}
+
+
+aggregate_store = AggregateStore()
@@ -0,0 +1,168 @@
+"""
+Declarative insurance recommendation rules
+
+Rules are plain data: a recommendation (type, priority, reason template) plus
+a list of (column, op, value) conditions that must all hold. RuleEngine
+compiles them once into NumPy predicates and evaluates every rule over a
+batch of users at a time, so running the rule set across the customer base
+costs a handful of vectorized comparisons per rule rather than a Python loop
+per user and rule.
+
+Columns:
+    age, dependents, income, city    from the AA profile (city compared lower-case)
+    policy                           held policy types, as a bitmask; ops "has" / "missing"
+    coverage:<type>                  total coverage of that policy type
+    cover_to_income:<type>           coverage of that type / annual income
+
+Ops: ==, !=, <, <=, >, >=, in, not in, has, missing.
+Reason templates are str.format'ed with the user's profile fields.
+"""
+
+import operator
+import string
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from models.insurance import AAData
+
+POLICY_TYPES = ("health", "life", "vehicle", "home", "travel")
+POLICY_BITS = {policy_type: 1 << i for i, policy_type in enumerate(POLICY_TYPES)}
+
+# Today's rules; order is the order recommendations are returned in
+INSURANCE_RULES = [
+    {
+        "type": "health",
+        "priority": "high",
+        "when": [("policy", "missing", "health")],
+        "reason": "A basic health plan protects against unexpected medical expenses."
+    },
+    {
+        "type": "life",
+        "priority": "high",
+        "when": [("dependents", ">", 0)],
+        "reason": "You have {dependents} dependents. Term insurance is recommended."
+    }
+]
+
+_COMPARE = {
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt,
+    "<=": operator.le, ">": operator.gt, ">=": operator.ge
+}
+
+
+def policy_mask(aa: AAData) -> int:
+    """Bitmask of the policy types a user holds; unknown types set no bit"""
+    mask = 0
+    for policy in aa.insurances:
+        mask |= POLICY_BITS.get(policy.type.lower(), 0)
+    return mask
+
+
+def build_columns(users: Sequence[AAData]) -> Dict[str, np.ndarray]:
+    """Column arrays for a batch of users (one pass over the records)"""
+    n = len(users)
+    index = {policy_type: i for i, policy_type in enumerate(POLICY_TYPES)}
+    coverage = np.zeros((len(POLICY_TYPES), n))
+    masks = np.zeros(n, dtype=np.int64)
+    numbers = np.empty((n, 3), dtype=np.float64)
+    cities = np.empty(n, dtype=object)
+
+    for j, aa in enumerate(users):
+        profile = aa.profile
+        numbers[j] = (profile.age, profile.dependents, profile.income)
+        cities[j] = profile.city.lower()
+        mask = 0
+        for policy in aa.insurances:
+            i = index.get(policy.type.lower())
+            if i is not None:
+                mask |= 1 << i
+                coverage[i, j] += policy.coverage
+        masks[j] = mask
+
+    columns = {
+        "age": numbers[:, 0].astype(np.int64),
+        "dependents": numbers[:, 1].astype(np.int64),
+        "income": numbers[:, 2].copy(),
+        "city": cities,
+        "policy": masks
+    }
+    for policy_type, i in index.items():
+        columns[f"coverage:{policy_type}"] = coverage[i]
+    return columns
+
+
+def _column(columns: Dict[str, np.ndarray], name: str) -> np.ndarray:
+    if name.startswith("cover_to_income:"):
+        cover = columns[f"coverage:{name.split(':', 1)[1]}"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(columns["income"] > 0, cover / columns["income"], np.inf)
+    return columns[name]
+
+
+def _compile_condition(column: str, op: str, value: Any) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    if column == "policy":
+        if op not in ("has", "missing"):
+            raise ValueError(f"policy conditions use 'has' or 'missing', not {op!r}")
+        bit = POLICY_BITS[value.lower()]
+        held = op == "has"
+        return lambda cols: ((cols["policy"] & bit) != 0) == held
+
+    if op in ("in", "not in"):
+        values = [v.lower() if isinstance(v, str) else v for v in value]
+        negate = op == "not in"
+        return lambda cols: np.isin(_column(cols, column), values) != negate
+
+    if op not in _COMPARE:
+        raise ValueError(f"Unknown rule operator {op!r}")
+    compare = _COMPARE[op]
+    if isinstance(value, str):
+        value = value.lower()
+    return lambda cols: compare(_column(cols, column), value)
+
+
+class RuleEngine:
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        self._predicates = [[_compile_condition(*condition) for condition in rule["when"]] for rule in rules]
+        # Profile fields each reason template needs; constant reasons are never formatted
+        self._fields = [[name for _, name, _, _ in string.Formatter().parse(rule["reason"]) if name]
+                        for rule in rules]
+
+    def match_matrix(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """(n_users, n_rules) boolean matrix of which rules fire for which users"""
+        n = len(columns["age"])
+        matches = np.ones((n, len(self.rules)), dtype=bool)
+        for j, predicates in enumerate(self._predicates):
+            for predicate in predicates:
+                matches[:, j] &= predicate(columns)
+        return matches
+
+    def recommend_batch(self, users: Sequence[AAData]) -> List[List[Dict[str, Any]]]:
+        """Recommendations for every user, in rule order"""
+        if not users:
+            return []
+        matches = self.match_matrix(build_columns(users))
+
+        results = [[] for _ in users]
+        # Rules in order, users in order: each user's list ends up in rule order
+        for rule, fields, column in zip(self.rules, self._fields, matches.T):
+            for i in np.flatnonzero(column).tolist():
+                reason = rule["reason"]
+                if fields:
+                    profile = users[i].profile
+                    reason = reason.format(**{name: getattr(profile, name) for name in fields})
+                results[i].append({"type": rule["type"], "priority": rule["priority"], "reason": reason})
+        return results
+
+    def recommend(self, aa: AAData) -> List[Dict[str, Any]]:
+        return self.recommend_batch([aa])[0]
+
+    def campaign_counts(self, users: Sequence[AAData]) -> List[Dict[str, Any]]:
+        """How many users each rule fires for, in rule order"""
+        counts = self.match_matrix(build_columns(users)).sum(axis=0) if users else [0] * len(self.rules)
+        return [{"type": rule["type"], "priority": rule["priority"], "users": int(count)}
+                for rule, count in zip(self.rules, counts)]
+
+
+insurance_rules = RuleEngine(INSURANCE_RULES)
@@ -0,0 +1,315 @@
+"""
+Request and pipeline-stage metrics in Prometheus text format
+
+- MetricsMiddleware (pure ASGI) counts requests and times them end to end,
+  labelled by method, route template and status.
+- TimedRoute splits each request into parse_request (body/params parsing and
+  validation), endpoint and serialize (response model dump / JSON render).
+- stage() / timed() time named pipeline stages (preprocess_data,
+  genfi_analyze, predict_credit_score, build_prompt, llm_call, ...) with the
+  current route plus optional model version, scoring path and LLM model labels.
+
+Every observation is a perf_counter delta, a bisect and a locked list update,
+so the instrumentation stays on in production; METRICS_ENABLED=false turns
+every metric into a no-op and GET /metrics into a 404. Otherwise GET /metrics
+serves registry.render().
+"""
+
+import asyncio
+import functools
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+
+from config import config
+from core.profiling import call_profiled
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route template of the request being handled, for stage labels
+_current_route: ContextVar[str] = ContextVar("metrics_route", default="")
+# Per-request timestamps shared between TimedRoute, its endpoint wrapper and FastJSONResponse
+_request_timings: ContextVar[Optional[dict]] = ContextVar("metrics_request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value != ""]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = None
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        if self.registry is not None and not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in sorted(items):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        if self.registry is not None and not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.registry = None
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        if self.registry is not None and not self.registry.enabled:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for labels, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:.6g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _register(self, metric):
+        metric.registry = self
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=config.METRICS_ENABLED)
+
+HTTP_REQUESTS = registry.counter("genfi_http_requests_total", "HTTP requests handled",
+                                 ("method", "route", "status"))
+HTTP_DURATION = registry.histogram("genfi_http_request_duration_seconds",
+                                   "End-to-end HTTP request latency, including streamed bodies",
+                                   ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge("genfi_http_requests_in_flight", "HTTP requests currently being handled")
+STAGE_DURATION = registry.histogram("genfi_stage_duration_seconds", "Time spent in each request/pipeline stage",
+                                    ("stage", "route", "model_version", "path", "model"))
+PREDICTIONS = registry.counter("genfi_predictions_total", "Profiles scored, by model version and scoring path",
+                               ("model_version", "path"))
+SCORING_ERRORS = registry.counter("genfi_scoring_errors_total",
+                                  "Scoring failures that fell back to the rule-based path", ("model_version",))
+LLM_REQUESTS = registry.counter("genfi_llm_requests_total", "Upstream LLM calls by model and outcome",
+                                ("model", "outcome"))
+LLM_CACHE = registry.counter("genfi_llm_cache_total", "LLM response cache lookups", ("result",))
+LLM_CIRCUIT_STATE = registry.gauge("genfi_llm_circuit_state", "LLM circuit breaker state: 0 closed, 1 half-open, 2 open")
+
+
+class stage:
+    """Time a block as one pipeline stage: `with stage("preprocess_data", version, "model"): ...`
+
+    `path` is the scoring path (agent, model or fallback); `model` names the LLM for llm_call.
+    """
+
+    __slots__ = ("name", "model_version", "path", "model", "start")
+
+    def __init__(self, name: str, model_version: str = "", path: str = "", model: str = ""):
+        self.name = name
+        self.model_version = model_version
+        self.path = path
+        self.model = model
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if registry.enabled:
+            STAGE_DURATION.observe(perf_counter() - self.start, self.name, _current_route.get(),
+                                   self.model_version, self.path, self.model)
+        return False
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of stage() for plain functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_render(seconds: float):
+    """Called by FastJSONResponse: JSON rendered inside an endpoint still counts as serialization"""
+    timings = _request_timings.get()
+    # Renders after the endpoint returned already fall in the serialize window
+    if timings is not None and "entered" in timings and "returned" not in timings:
+        timings["render"] += seconds
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint so TimedRoute knows when FastAPI called it and when it returned"""
+    if getattr(endpoint, "_metrics_timed", False):
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _request_timings.get()
+            if timings is not None:
+                timings["entered"] = perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings["returned"] = perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = _request_timings.get()
+            if timings is not None:
+                timings["entered"] = perf_counter()
+            try:
+                # Sync endpoints run on a worker thread, outside the event loop's profiler
+                return call_profiled(endpoint, *args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings["returned"] = perf_counter()
+
+    wrapper._metrics_timed = True
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records parse_request / endpoint / serialize stages for every call"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            if not registry.enabled:
+                return await handler(request)
+
+            timings = {"start": perf_counter(), "render": 0.0}
+            timings_token = _request_timings.set(timings)
+            route_token = _current_route.set(route)
+            try:
+                return await handler(request)
+            finally:
+                end = perf_counter()
+                _request_timings.reset(timings_token)
+                _current_route.reset(route_token)
+                entered, returned = timings.get("entered"), timings.get("returned")
+                # Requests rejected during validation never reach the endpoint
+                if entered is not None and returned is not None:
+                    render = timings["render"]
+                    STAGE_DURATION.observe(entered - timings["start"], "parse_request", route, "", "", "")
+                    STAGE_DURATION.observe(returned - entered - render, "endpoint", route, "", "", "")
+                    STAGE_DURATION.observe(end - returned + render, "serialize", route, "", "", "")
+
+        return timed_handler
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request count, status and end-to-end latency per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            HTTP_DURATION.observe(perf_counter() - start, scope["method"], route)
@@ -0,0 +1,99 @@
+"""
+In-process micro-batching for concurrent requests
+
+Requests that arrive within a short window (or until the batch is full) are
+collected and handed to one batch function call on a worker thread; each
+caller then gets its own result back. Under load this turns hundreds of
+(1, n_features) model calls into a few batched ones, at the cost of at most
+`max_wait_ms` extra latency for the first request in a window.
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List
+
+from core.profiling import call_profiled
+
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Longest window configure() accepts; anything longer only adds latency
+MAX_WAIT_MS = 50.0
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 3.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending = []
+        self._timer = None
+        self._running = set()
+        self.batches = 0
+        self.items = 0
+        self._histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+
+    def configure(self, max_batch_size: int = None, max_wait_ms: float = None):
+        if max_batch_size is not None:
+            self.max_batch_size = max(1, max_batch_size)
+        if max_wait_ms is not None:
+            self.max_wait_ms = min(max(0.0, max_wait_ms), MAX_WAIT_MS)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size or self.max_wait_ms <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._record(len(batch))
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await asyncio.to_thread(call_profiled, self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (client disconnect) while the batch ran
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if size <= bound:
+                self._histogram[i] += 1
+                return
+        self._histogram[-1] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in HISTOGRAM_BUCKETS] + ["gt_%d" % HISTOGRAM_BUCKETS[-1]]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "batch_size_histogram": dict(zip(labels, self._histogram)),
+            "pending": len(self._pending)
+        }
@@ -0,0 +1,201 @@
+"""
+On-demand per-request profiling
+
+ProfilingMiddleware runs selected requests under cProfile and saves the
+result to PROFILE_DIR (a .prof file for snakeviz/pstats plus a text report
+with the hottest functions and their callees, wall and CPU time), or
+returns the report in place of the response.
+
+A request is profiled when
+- it carries `X-Profile: <PROFILE_TOKEN>` (or `?profile=<PROFILE_TOKEN>`);
+  add `X-Profile-Output: inline` (or `&profile_output=inline`) to get the
+  report back instead of the normal response, or
+- it is the Nth request and PROFILE_SAMPLE_EVERY=N (written to PROFILE_DIR).
+
+Without a token and with sampling off the middleware is a single attribute
+check per request. Before Python 3.12 cProfile hooks one thread at a time,
+so work handed to worker threads (sync endpoints, the micro-batcher) is
+profiled through call_profiled(); from 3.12 the request's profiler already
+sees every thread and call_profiled() just calls through. The event-loop thread is shared, so coroutines of other
+requests that run while a profiled request is waiting show up in its
+profile too; only one request is profiled at a time.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+from urllib.parse import parse_qs
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+
+class RequestProfile:
+    """cProfile data for one request, across the event loop and worker threads"""
+
+    def __init__(self):
+        self.loop_profiler = cProfile.Profile()
+        self._thread_profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def runcall(self, fn: Callable, *args, **kwargs) -> Any:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: one profiler per interpreter, and loop_profiler already covers this thread
+            return fn(*args, **kwargs)
+        with self._lock:
+            self._thread_profilers.append(profiler)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.loop_profiler)
+        with self._lock:
+            for profiler in self._thread_profilers:
+                stats.add(profiler)
+        return stats
+
+
+def call_profiled(fn: Callable, *args, **kwargs) -> Any:
+    """Call fn, under the current request's profiler if it is being profiled"""
+    profile = _active_profile.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    return profile.runcall(fn, *args, **kwargs)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def render_report(stats: pstats.Stats, summary: dict, top: int = 40) -> str:
+    """Text report: request summary, hottest functions by cumulative time and their callees"""
+    out = io.StringIO()
+    for key, value in summary.items():
+        out.write(f"{key}: {value}\n")
+    out.write("\n")
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(top)
+    stats.print_callees(min(top, 15))
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles token-flagged or sampled requests"""
+
+    def __init__(self, app, token: Optional[str] = None, sample_every: int = 0,
+                 profile_dir: Optional[str] = None, top: int = 40):
+        self.app = app
+        self.token = token or None
+        self.sample_every = max(0, sample_every)
+        self.profile_dir = profile_dir
+        self.top = top
+        self.enabled = bool(self.token or self.sample_every)
+        self._requests = 0
+        self._busy = False
+
+    def _requested(self, scope) -> Optional[str]:
+        """'inline' or 'file' when the request asked for a profile with a valid token"""
+        supplied = _header(scope, b"x-profile")
+        output = _header(scope, b"x-profile-output")
+        if supplied is None and b"profile=" in scope.get("query_string", b""):
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            supplied = query.get("profile", [None])[0]
+            output = output or query.get("profile_output", [None])[0]
+        if supplied is None or not hmac.compare_digest(supplied.encode(), self.token.encode()):
+            return None
+        return "inline" if output == "inline" else "file"
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._requested(scope) if self.token else None
+        if mode is None and self.sample_every:
+            self._requests += 1
+            if self._requests % self.sample_every == 0:
+                mode = "file"
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if self._busy:
+            print(f"⚠️  Profiler busy, not profiling {scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        try:
+            await self._profile(scope, receive, send, mode)
+        finally:
+            self._busy = False
+
+    async def _profile(self, scope, receive, send, mode: str):
+        profile = RequestProfile()
+        status = 500
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            # Inline mode replaces the response with the report
+            if mode != "inline":
+                await send(message)
+
+        token = _active_profile.set(profile)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        profile.loop_profiler.enable()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profile.loop_profiler.disable()
+            _active_profile.reset(token)
+
+        summary = {
+            "request": f"{scope['method']} {scope['path']}",
+            "status": status,
+            "wall_ms": round((time.perf_counter() - wall_start) * 1000, 2),
+            # Process-wide, so it includes worker threads (and anything else running meanwhile)
+            "cpu_ms": round((time.process_time() - cpu_start) * 1000, 2),
+            "timestamp": datetime.now().isoformat(),
+        }
+        stats = profile.stats()
+        report = render_report(stats, summary, self.top)
+
+        if mode == "inline":
+            body = report.encode("utf-8")
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profile-wall-ms", str(summary["wall_ms"]).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        if self.profile_dir:
+            path = await asyncio.to_thread(self._write, stats, report, summary)
+            print(f"📈 Profiled {summary['request']} ({summary['wall_ms']} ms) -> {path}")
+
+    def _write(self, stats: pstats.Stats, report: str, summary: dict) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", summary["request"]).strip("_")[:80]
+        base = os.path.join(self.profile_dir, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{slug}_{summary['wall_ms']:.0f}ms")
+        stats.dump_stats(base + ".prof")
+        with open(base + ".txt", "w") as f:
+            f.write(report)
+        return base + ".prof"
@@ -0,0 +1,58 @@
+"""
+Fast JSON serialization for API responses
+
+FastJSONResponse is the app's default response class. It renders with orjson
+when it is installed (falling back to compact stdlib json) and understands
+NumPy scalars/arrays, which the scoring paths return. Routes that return
+plain dicts can hand their payload straight to FastJSONResponse to skip
+FastAPI's jsonable_encoder pass; routes with a response_model keep FastAPI's
+Pydantic dump_json path.
+"""
+
+import json
+from datetime import date, datetime
+from time import perf_counter
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from core.metrics import record_render
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(obj: Any):
+    # Everything stdlib json can't handle on its own
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson_default(obj: Any):
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise TypeError
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_orjson_default, option=_ORJSON_OPTIONS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        start = perf_counter()
+        body = dumps(content)
+        record_render(perf_counter() - start)
+        return body
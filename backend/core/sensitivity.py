@@ -0,0 +1,151 @@
+"""
+What-if score sensitivity
+
+sweep() takes one credit profile and candidate values for a few levers
+(credit_utilization, total_debt, monthly_income, employment_years, ...),
+scores the full Cartesian grid of those values in one vectorized call
+through the live scoring path, and reports the score surface, the effect
+of moving each lever on its own, and the cheapest change that reaches the
+next score band.
+
+A change's cost is the sum over levers of |new - current| / unit, where
+unit is the size of one comparable step of effort (LEVER_UNITS, or set per
+request): cutting utilization by 10 points costs as much as paying down
+50,000 of debt.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from models.credit_model import FEATURE_DEFAULTS, SCORE_BANDS, GenFiCreditSystem, score_band
+
+# Levers that can be swept and the size of one unit of effort for each
+LEVER_UNITS = {
+    'credit_utilization': 10,
+    'total_debt': 50000,
+    'monthly_income': 10000,
+    'employment_years': 1,
+    'payment_history_score': 5,
+    'existing_loans_count': 1,
+    'loan_amount': 100000,
+    'loan_tenure_months': 12,
+}
+DEFAULT_STEPS = 11
+# Most candidate values one lever may have (steps or explicit values)
+MAX_LEVER_VALUES = 1000
+
+
+def lever_values(current: float, values=None, low: Optional[float] = None, high: Optional[float] = None,
+                 steps: int = DEFAULT_STEPS) -> np.ndarray:
+    """Sorted candidate values for one lever; the current value is always included"""
+    if values is None:
+        if low is None or high is None:
+            raise ValueError("give either values or both min and max")
+        if steps < 2 or low > high:
+            raise ValueError("need min <= max and at least 2 steps")
+        values = np.linspace(low, high, steps)
+    return np.union1d(np.asarray(values, dtype=np.float64), [current])
+
+
+def _next_band(score: int):
+    """(minimum score, category) of the band above score, or None at the top"""
+    above = [band for band in SCORE_BANDS if band[0] > score]
+    return above[-1][:2] if above else None
+
+
+def sweep(system: GenFiCreditSystem, profile: Dict[str, float], levers: Dict[str, dict],
+          max_points: int = 50000) -> dict:
+    """Score the grid of lever values around profile and find the cheapest next-band change
+
+    `levers` maps a LEVER_UNITS name to keyword arguments for lever_values()
+    plus an optional `unit`.
+    """
+    if not levers:
+        raise ValueError("give at least one lever")
+    unknown = sorted(set(levers) - set(LEVER_UNITS))
+    if unknown:
+        raise ValueError(f"unknown levers {unknown}; choose from {sorted(LEVER_UNITS)}")
+
+    # Unset fields take the scoring defaults, so every grid row is a complete profile
+    base = {field: float(profile[field]) if profile.get(field) is not None else float(default)
+            for field, default in FEATURE_DEFAULTS.items()}
+    names = list(levers)
+    specs = [dict(levers[name]) for name in names]
+    # Size the grid before allocating anything; the current value may add one point per axis
+    bound = 1
+    for spec in specs:
+        count = len(spec['values']) if spec.get('values') is not None else spec.get('steps', DEFAULT_STEPS)
+        if count > MAX_LEVER_VALUES:
+            raise ValueError(f"at most {MAX_LEVER_VALUES} values per lever")
+        bound *= count + 1
+    if bound > max_points:
+        raise ValueError(f"grid has up to {bound} points (max {max_points}); use fewer levers or steps")
+
+    axes, units = [], []
+    for name, spec in zip(names, specs):
+        unit = spec.pop('unit', None)
+        if unit is not None and unit <= 0:
+            raise ValueError(f"unit for {name} must be positive")
+        units.append(float(unit or LEVER_UNITS[name]))
+        axes.append(lever_values(base[name], **spec))
+    shape = tuple(len(axis) for axis in axes)
+    size = int(np.prod(shape))
+
+    grids = [grid.ravel() for grid in np.meshgrid(*axes, indexing='ij')]
+    columns = {field: np.full(size, value) for field, value in base.items()}
+    columns.update(zip(names, grids))
+    # A missing income counts as 1 in the debt ratio, as in /predict
+    if profile.get('monthly_income') is None and 'monthly_income' not in levers:
+        ratio_income = np.ones(size)
+    else:
+        ratio_income = columns['monthly_income']
+    scores, path = system.score_grid(columns, ratio_income)
+
+    surface = scores.reshape(shape)
+    position = tuple(int(np.searchsorted(axis, base[name])) for axis, name in zip(axes, names))
+    base_score = int(surface[position])
+    effects = {}
+    for k, name in enumerate(names):
+        # This lever moves, every other lever stays at the current value
+        line = surface[position[:k] + (slice(None),) + position[k + 1:]]
+        effects[name] = [
+            {"value": value, "score": score, "change": score - base_score}
+            for value, score in zip(axes[k].tolist(), line.tolist())
+        ]
+
+    result = {
+        "base_score": base_score,
+        "band": score_band(base_score)[1],
+        "model_version": system.model_version,
+        "scoring_path": path,
+        "grid_points": size,
+        "levers": [{"name": name, "values": axis.tolist(), "unit": unit}
+                   for name, axis, unit in zip(names, axes, units)],
+        "scores": surface.tolist(),
+        "effects": effects,
+        "next_band": None,
+    }
+
+    target = _next_band(base_score)
+    if target is None:
+        return result
+    minimum, category = target
+    deltas = [grid - base[name] for grid, name in zip(grids, names)]
+    cost = sum(np.abs(delta) / unit for delta, unit in zip(deltas, units))
+    levers_changed = sum((delta != 0).astype(np.int64) for delta in deltas)
+    reaches = np.flatnonzero(scores >= minimum)
+    next_band = {"band": category, "min_score": minimum, "reachable": bool(len(reaches))}
+    if len(reaches):
+        # Cheapest first, then the higher score, then the fewest levers moved
+        best = reaches[np.lexsort((levers_changed[reaches], -scores[reaches], cost[reaches]))[0]]
+        next_band.update({
+            "score": int(scores[best]),
+            "cost": round(float(cost[best]), 3),
+            "changes": {
+                name: {"from": base[name], "to": float(grid[best])}
+                for name, grid, delta in zip(names, grids, deltas) if delta[best] != 0
+            }
+        })
+    result["next_band"] = next_band
+    return result
@@ -0,0 +1,285 @@
+"""
+Columnar per-user transaction store
+
+Each user's history is kept as parallel NumPy arrays sorted by day (days
+since 1970-01-01) instead of a list of BankTransaction / UPITransaction
+objects. Prefix sums over the sorted columns make any date-range sum two
+binary searches, and monthly buckets, the credit/debit split and
+per-receiver totals are single vectorized reductions.
+"""
+
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from core.financial_aggregates import aggregate_store
+from services.aa_parser import EPOCH_ORDINAL, TXN_CREDIT, TXN_UPI, normalize_transaction, stream_aa_columns
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+MOCK_USER_ID = "user1"
+
+DayLike = Union[int, date, str, None]
+
+
+def to_day(value: DayLike) -> Optional[int]:
+    """Days since 1970-01-01 for a date, ISO string or day number"""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day: int) -> date:
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+class UserTransactions:
+    """One user's transactions as date-sorted columns"""
+
+    def __init__(self, day: np.ndarray, amount: np.ndarray, kind: np.ndarray,
+                 receiver: np.ndarray, receivers: List[str]):
+        order = np.argsort(day, kind="stable")
+        self.day = np.ascontiguousarray(day[order], dtype=np.int32)
+        self.amount = np.ascontiguousarray(amount[order], dtype=np.float64)
+        self.kind = np.ascontiguousarray(kind[order], dtype=np.int8)
+        self.receiver = np.ascontiguousarray(receiver[order], dtype=np.int32)
+        self.receivers = receivers
+
+        credit = np.where(self.kind == TXN_CREDIT, self.amount, 0.0)
+        upi = np.where(self.kind == TXN_UPI, self.amount, 0.0)
+        debit = self.amount - credit
+        # Prefix sums with a leading zero: sum over rows [i, j) is cum[j] - cum[i]
+        self._cum = {
+            "credit": np.concatenate(([0.0], np.cumsum(credit))),
+            "debit": np.concatenate(([0.0], np.cumsum(debit))),
+            "upi": np.concatenate(([0.0], np.cumsum(upi)))
+        }
+
+    @classmethod
+    def empty(cls) -> "UserTransactions":
+        return cls(np.empty(0, np.int32), np.empty(0), np.empty(0, np.int8), np.empty(0, np.int32), [])
+
+    @classmethod
+    def from_column_batches(cls, batches: Iterable[Dict[str, Any]]) -> "UserTransactions":
+        """Build from stream_aa_columns batches"""
+        batches = list(batches)
+        if not batches:
+            return cls.empty()
+        return cls(np.concatenate([b["day"] for b in batches]),
+                   np.concatenate([b["amount"] for b in batches]),
+                   np.concatenate([b["type"] for b in batches]),
+                   np.concatenate([b["receiver"] for b in batches]),
+                   batches[-1]["receivers"])
+
+    def merge(self, other: "UserTransactions") -> "UserTransactions":
+        """A new store holding both histories (receiver codes are re-mapped)"""
+        codes = {name: i for i, name in enumerate(self.receivers)}
+        receivers = list(self.receivers)
+        remap = np.empty(len(other.receivers) + 1, dtype=np.int32)
+        remap[-1] = -1
+        for i, name in enumerate(other.receivers):
+            if name not in codes:
+                codes[name] = len(receivers)
+                receivers.append(name)
+            remap[i] = codes[name]
+
+        return UserTransactions(np.concatenate((self.day, other.day)),
+                                np.concatenate((self.amount, other.amount)),
+                                np.concatenate((self.kind, other.kind)),
+                                np.concatenate((self.receiver, remap[other.receiver])),
+                                receivers)
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def first_day(self) -> Optional[int]:
+        return int(self.day[0]) if len(self) else None
+
+    @property
+    def last_day(self) -> Optional[int]:
+        return int(self.day[-1]) if len(self) else None
+
+    def _bounds(self, start: DayLike, end: DayLike):
+        """Row slice for start <= day <= end (both optional)"""
+        lo = 0 if start is None else int(np.searchsorted(self.day, to_day(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.day, to_day(end), side="right"))
+        return lo, max(lo, hi)
+
+    def range_sum(self, start: DayLike = None, end: DayLike = None, kind: str = "credit") -> float:
+        """Total of `kind` ('credit', 'debit' or 'upi') between two dates, inclusive"""
+        lo, hi = self._bounds(start, end)
+        cum = self._cum[kind]
+        return float(cum[hi] - cum[lo])
+
+    def split(self, start: DayLike = None, end: DayLike = None) -> Dict[str, float]:
+        """Credit / debit totals; debit includes UPI payments, also reported on their own"""
+        lo, hi = self._bounds(start, end)
+        return {kind: round(float(cum[hi] - cum[lo]), 2) for kind, cum in self._cum.items()}
+
+    def monthly(self, start: DayLike = None, end: DayLike = None) -> List[Dict[str, Any]]:
+        """Income and expenses per calendar month"""
+        lo, hi = self._bounds(start, end)
+        if lo == hi:
+            return []
+
+        months = self.day[lo:hi].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        first = months[0]
+        index = months - first
+        n = int(index[-1]) + 1
+        credit = self.kind[lo:hi] == TXN_CREDIT
+        income = np.bincount(index, weights=np.where(credit, self.amount[lo:hi], 0.0), minlength=n)
+        expenses = np.bincount(index, weights=np.where(credit, 0.0, self.amount[lo:hi]), minlength=n)
+        counts = np.bincount(index, minlength=n)
+
+        labels = np.arange(first, first + n).astype("datetime64[M]").astype(str).tolist()
+        return [
+            {"month": label, "income": round(float(inc), 2), "expenses": round(float(exp), 2),
+             "transactions": int(count)}
+            for label, inc, exp, count in zip(labels, income, expenses, counts)
+        ]
+
+    def top_receivers(self, n: int = 5, start: DayLike = None, end: DayLike = None) -> List[Dict[str, Any]]:
+        """Largest UPI payees by total amount"""
+        lo, hi = self._bounds(start, end)
+        codes = self.receiver[lo:hi]
+        paid = codes >= 0
+        if not paid.any() or not self.receivers:
+            return []
+
+        totals = np.bincount(codes[paid], weights=self.amount[lo:hi][paid], minlength=len(self.receivers))
+        counts = np.bincount(codes[paid], minlength=len(self.receivers))
+        top = np.argsort(-totals, kind="stable")[:n]
+        return [{"receiver": self.receivers[i], "amount": round(float(totals[i]), 2), "transactions": int(counts[i])}
+                for i in top if counts[i]]
+
+    def profile_inputs(self, months: int = 3, as_of: DayLike = None) -> Dict[str, float]:
+        """Average monthly income / expenses over the trailing `months` calendar months,
+        in the shape compute_genfi_score expects"""
+        if not len(self):
+            return {}
+
+        end = self.last_day if as_of is None else to_day(as_of)
+        end_month = np.int64(end).astype("datetime64[D]").astype("datetime64[M]")
+        start_month = max(end_month - (months - 1),
+                          np.int64(self.first_day).astype("datetime64[D]").astype("datetime64[M]"))
+        start = int(start_month.astype("datetime64[D]").astype(np.int64))
+        span = max(1, int((end_month - start_month).astype(np.int64)) + 1)
+
+        return {
+            "income": round(self.range_sum(start, end, "credit") / span, 2),
+            "expenses": round(self.range_sum(start, end, "debit") / span, 2)
+        }
+
+    def summary(self, start: DayLike = None, end: DayLike = None, top: int = 5) -> Dict[str, Any]:
+        return {
+            "transactions": len(self),
+            "first_date": from_day(self.first_day).isoformat() if len(self) else None,
+            "last_date": from_day(self.last_day).isoformat() if len(self) else None,
+            "totals": self.split(start, end),
+            "monthly": self.monthly(start, end),
+            "top_receivers": self.top_receivers(top, start, end),
+            "profile_inputs": self.profile_inputs()
+        }
+
+
+class TransactionStore:
+    """user_id -> UserTransactions; stores are immutable and replaced whole on import.
+
+    Incrementally ingested rows are buffered and only folded into the columnar
+    store when the full history is read; the rolling aggregates used for
+    scoring are updated right away.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, UserTransactions] = {}
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    def _seed(self):
+        # The demo user gets the bundled mock statements on first access
+        if self._seeded:
+            return
+        with self._lock:
+            if self._seeded:
+                return
+            batches = []
+            for name in ("bank_mock.json", "upi_mock.json"):
+                path = os.path.join(DATA_DIR, name)
+                if os.path.exists(path):
+                    batches.append(UserTransactions.from_column_batches(stream_aa_columns(path)))
+            if batches:
+                store = batches[0]
+                for extra in batches[1:]:
+                    store = store.merge(extra)
+                if MOCK_USER_ID not in self._users:
+                    self._users[MOCK_USER_ID] = store
+                    aggregate_store.rebuild(MOCK_USER_ID, store.day, store.amount, store.kind)
+            self._seeded = True
+
+    def get(self, user_id: str) -> Optional[UserTransactions]:
+        self._seed()
+        if self._pending.get(user_id):
+            with self._lock:
+                rows = self._pending.pop(user_id, [])
+                if rows:
+                    fresh = UserTransactions.from_column_batches([_rows_to_columns(rows)])
+                    current = self._users.get(user_id)
+                    self._users[user_id] = fresh if current is None else current.merge(fresh)
+        return self._users.get(user_id)
+
+    def ingest(self, user_id: str, transactions: Iterable[Dict[str, Any]]) -> int:
+        """Append bank/UPI transactions (BankTransaction / UPITransaction / AA fields)"""
+        self._seed()
+        rows = [normalize_transaction(raw, seq) for seq, raw in enumerate(transactions, 1)]
+        with self._lock:
+            self._pending.setdefault(user_id, []).extend(rows)
+        aggregate_store.ingest(user_id, [(to_day(txn_date), amount, kind)
+                                         for kind, _, amount, txn_date, _ in rows])
+        return len(rows)
+
+    def import_aa(self, user_id: str, source, replace: bool = False) -> UserTransactions:
+        """Stream-parse an AA payload (path, text, bytes or chunks) into the user's store"""
+        imported = UserTransactions.from_column_batches(stream_aa_columns(source))
+        self._seed()
+        with self._lock:
+            current = self._users.get(user_id)
+            store = imported if replace or current is None else current.merge(imported)
+            self._users[user_id] = store
+        store = self.get(user_id)
+        aggregate_store.rebuild(user_id, store.day, store.amount, store.kind)
+        return store
+
+    def aggregates(self, user_id: str):
+        """The user's rolling aggregates (UserAggregates), without touching the full history"""
+        self._seed()
+        return aggregate_store.get(user_id)
+
+    def with_aggregates(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """`profile` with income/expenses replaced by the user's rolling aggregates, if any"""
+        if not profile.get("user_id"):
+            return profile
+        self._seed()
+        inputs = aggregate_store.profile_inputs(profile["user_id"])
+        return {**profile, **inputs} if inputs else profile
+
+
+def _rows_to_columns(rows) -> Dict[str, Any]:
+    """Column batch (as from stream_aa_columns) for normalize_transaction rows"""
+    receivers = sorted({receiver for *_, receiver in rows if receiver is not None})
+    codes = {name: i for i, name in enumerate(receivers)}
+    return {
+        "day": np.array([to_day(txn_date) for _, _, _, txn_date, _ in rows], dtype=np.int32),
+        "amount": np.array([amount for _, _, amount, _, _ in rows], dtype=np.float64),
+        "type": np.array([kind for kind, *_ in rows], dtype=np.int8),
+        "receiver": np.array([codes.get(receiver, -1) for *_, receiver in rows], dtype=np.int32),
+        "receivers": receivers
+    }
+
+
+transaction_store = TransactionStore()
@@ -1,12 +1,20 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from config import config
+from core.metrics import MetricsMiddleware, TimedRoute, registry as metrics_registry
+from core.profiling import ProfilingMiddleware
+from core.responses import FastJSONResponse
+from models import credit_model
 from routers import credit_agent, planner_agent, explain_agent, insurance_agent
+from services.llm_client import llm_client
 
 # Validate configuration on startup
 config.validate()
 
-app = FastAPI(title="GenFi Credit & Insurance Agent API")
+app = FastAPI(title="GenFi Credit & Insurance Agent API", default_response_class=FastJSONResponse)
+app.router.route_class = TimedRoute
 
 # Add CORS middleware for Flutter app
 app.add_middleware(
@@ -17,6 +25,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in cProfile runs: X-Profile token or 1-in-PROFILE_SAMPLE_EVERY sampling
+app.add_middleware(
+    ProfilingMiddleware,
+    token=config.PROFILE_TOKEN,
+    sample_every=config.PROFILE_SAMPLE_EVERY,
+    profile_dir=config.PROFILE_DIR,
+    top=config.PROFILE_TOP_FUNCTIONS
+)
+
+# Outermost, so it times CORS handling and streamed bodies too
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(credit_agent.router)
 app.include_router(planner_agent.router)
 app.include_router(explain_agent.router)
@@ -26,6 +46,37 @@ app.include_router(insurance_agent.router)
 def read_root():
     return {"message": "Welcome to GenFi Credit Agent API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: request counts, latency histograms and per-stage timings"""
+    if not metrics_registry.enabled:
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+_ready = False
+_warm_up_lock = asyncio.Lock()
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: warms the model, LLM client and scoring paths before reporting ready"""
+    global _ready
+    async with _warm_up_lock:
+        if not _ready:
+            try:
+                await asyncio.to_thread(credit_model.warm_up)
+                await llm_client.warm()
+                _ready = True
+            except Exception as e:
+                return JSONResponse(status_code=503, content={"ready": False, "error": str(e)})
+
+    return {
+        "ready": True,
+        "model_version": credit_model.current_system().model_version,
+        "llm_available": llm_client.available,
+        "llm_model": llm_client.model_name,
+        "llm_circuit": llm_client.breaker.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
@@ -6,8 +6,10 @@ Helps convert your Jupyter notebook model for production use
 import pickle
 import joblib
 import os
+import sys
 
-def save_model_for_production(model, scaler=None, feature_names=None, model_path="credit_model.pkl"):
+def save_model_for_production(model, scaler=None, feature_names=None, model_path="credit_model.pkl",
+                              artifact_format="pickle", compile_trees=True):
     """
     Save your trained model in a format ready for production
     
@@ -16,6 +18,10 @@ def save_model_for_production(model, scaler=None, feature_names=None, model_path
         scaler: Optional preprocessing scaler
         feature_names: List of feature names in order
         model_path: Where to save the model
+        artifact_format: "pickle" for a single file, or "mmap" for an artifact
+            directory whose arrays are memory-mapped and shared by all workers
+        compile_trees: For tree ensembles (RandomForest, GradientBoosting, XGBoost),
+            also store a flat-array compiled copy used for fast scoring
     """
     try:
         model_data = {
@@ -25,8 +31,23 @@ def save_model_for_production(model, scaler=None, feature_names=None, model_path
             'model_type': type(model).__name__
         }
         
-        with open(model_path, 'wb') as f:
-            pickle.dump(model_data, f)
+        if compile_trees:
+            from models.tree_compiler import UnsupportedModelError, compile_tree_ensemble, verify_compiled
+            try:
+                compiled = compile_tree_ensemble(model)
+                max_diff = verify_compiled(model, compiled)
+                model_data['compiled_model'] = compiled
+                print(f"Compiled {compiled.n_trees} trees (max deviation {max_diff:.2e})")
+            except UnsupportedModelError:
+                pass
+        
+        if artifact_format == "mmap":
+            from models.artifact_format import save_artifact
+            manifest = save_artifact(model_data, model_path)
+            print(f"Memory-mapped arrays: {len(manifest['arrays'])} ({manifest['array_bytes']:,} bytes)")
+        else:
+            with open(model_path, 'wb') as f:
+                pickle.dump(model_data, f)
         
         print(f"Model saved successfully to {model_path}")
         print(f"Model type: {type(model).__name__}")
@@ -119,7 +140,22 @@ def example_usage():
     )
     """
 
+def convert_to_mmap_artifact(pickle_path, artifact_path):
+    """Convert an existing model pickle into the memory-mapped artifact format"""
+    from models.artifact_format import convert_pickle_to_artifact
+    
+    manifest = convert_pickle_to_artifact(pickle_path, artifact_path)
+    print(f"Converted {pickle_path} -> {artifact_path}")
+    print(f"Version: {manifest['content_hash'][:12]}, arrays: {len(manifest['arrays'])} "
+          f"({manifest['array_bytes']:,} bytes)")
+    return artifact_path
+
 if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "to-mmap":
+        convert_to_mmap_artifact(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    
     print("Model Converter Utility")
     print("Use this script to convert your Jupyter notebook models for production")
-    print("See example_usage() for different model types")
\ No newline at end of file
+    print("See example_usage() for different model types")
+    print("Convert a pickle to a memory-mapped artifact: python model_converter.py to-mmap <model.pkl> <artifact_dir>")
\ No newline at end of file
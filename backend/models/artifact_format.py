@@ -0,0 +1,126 @@
+"""
+Memory-mappable model artifact format
+
+A plain pickle makes every uvicorn worker hold its own private copy of the
+model's arrays. This format pickles the object graph as usual, except that
+every large NumPy array is written out as its own .npy file. Workers load
+those arrays with np.load(mmap_mode='r'), so all processes on a host share
+the same page-cache pages and startup no longer grows with array size.
+
+Layout of an artifact directory:
+
+    manifest.json   format version, content hash, array index
+    objects.pkl     the pickled object graph with arrays replaced by references
+    arrays/*.npy    one file per externalized array
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+FORMAT_NAME = "genfi-mmap"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+OBJECTS_FILE = "objects.pkl"
+ARRAYS_DIR = "arrays"
+
+# Smaller arrays stay inline in the pickle; mapping them would cost more than it saves
+MIN_EXTERNAL_BYTES = 4096
+
+
+class _ArrayExternalizingPickler(pickle.Pickler):
+    def __init__(self, file, arrays_dir: str, min_bytes: int):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_dir = arrays_dir
+        self.min_bytes = min_bytes
+        self.arrays = []
+        self._saved = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+
+        # The same array referenced twice is stored once
+        name = self._saved.get(id(obj))
+        if name is None:
+            name = f"{len(self.arrays):05d}.npy"
+            np.save(os.path.join(self.arrays_dir, name), np.ascontiguousarray(obj), allow_pickle=False)
+            self._saved[id(obj)] = name
+            self.arrays.append({"file": name, "dtype": obj.dtype.str, "shape": list(obj.shape),
+                                "nbytes": int(obj.nbytes)})
+        return ("ndarray", name)
+
+
+class _ArrayMappingUnpickler(pickle.Unpickler):
+    def __init__(self, file, arrays_dir: str):
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != "ndarray":
+            raise pickle.UnpicklingError(f"Unknown persistent id {kind!r}")
+        return np.load(os.path.join(self.arrays_dir, name), mmap_mode="r", allow_pickle=False)
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def _hash_files(paths) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(obj: Any, path: str, min_external_bytes: int = MIN_EXTERNAL_BYTES) -> Dict[str, Any]:
+    """Write `obj` as an artifact directory and return its manifest"""
+    arrays_dir = os.path.join(path, ARRAYS_DIR)
+    os.makedirs(arrays_dir, exist_ok=True)
+
+    objects_path = os.path.join(path, OBJECTS_FILE)
+    with open(objects_path, "wb") as f:
+        pickler = _ArrayExternalizingPickler(f, arrays_dir, min_external_bytes)
+        pickler.dump(obj)
+
+    array_paths = [os.path.join(arrays_dir, a["file"]) for a in pickler.arrays]
+    manifest = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "content_hash": _hash_files([objects_path] + array_paths),
+        "arrays": pickler.arrays,
+        "array_bytes": sum(a["nbytes"] for a in pickler.arrays)
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def load_artifact(path: str) -> Tuple[Any, Dict[str, Any]]:
+    """Load an artifact directory; large arrays come back as read-only memory maps"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != FORMAT_NAME or manifest.get("format_version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format in {path}: "
+                         f"{manifest.get('format')} v{manifest.get('format_version')}")
+
+    with open(os.path.join(path, OBJECTS_FILE), "rb") as f:
+        obj = _ArrayMappingUnpickler(f, os.path.join(path, ARRAYS_DIR)).load()
+
+    return obj, manifest
+
+
+def convert_pickle_to_artifact(pickle_path: str, artifact_path: str) -> Dict[str, Any]:
+    """Convert an existing model pickle (e.g. from save_model_for_production) to an artifact"""
+    with open(pickle_path, "rb") as f:
+        obj = pickle.load(f)
+    return save_artifact(obj, artifact_path)
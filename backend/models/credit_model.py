@@ -3,12 +3,99 @@ GenFi Credit System Integration
 Integrates your complete GenFi Credit Agent system
 """
 
+import hashlib
 import pickle
 import numpy as np
-import pandas as pd
-from typing import Dict, Any, Tuple, List
-import joblib
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple, List
 import os
+from config import config
+from core.cache import TTLCache, canonical_hash
+from core.metrics import PREDICTIONS, SCORING_ERRORS, stage
+from models.artifact_format import is_artifact, load_artifact
+from models.model_registry import ModelRegistry, ModelValidationError
+from models.process_pool import GenFiProcessPool
+from models.tree_compiler import CompiledForest, UnsupportedModelError, compile_tree_ensemble, verify_compiled
+
+FALLBACK_RECOMMENDATIONS = [
+    'Maintain low credit utilization (under 30%)',
+    'Pay bills on time to improve payment history',
+    'Keep old credit accounts open to maintain credit age'
+]
+
+# Model input fields and the values used when a profile leaves them out
+FEATURE_DEFAULTS = {
+    'age': 30,
+    'monthly_income': 50000,
+    'current_credit_score': 750,
+    'total_debt': 0,
+    'employment_years': 5,
+    'loan_amount': 100000,
+    'loan_tenure_months': 60,
+    'existing_loans_count': 0,
+    'credit_utilization': 30,
+    'payment_history_score': 85,
+}
+
+# (minimum score, category, color), best first
+SCORE_BANDS = [
+    (800, "Excellent", "green"),
+    (740, "Very Good", "light_green"),
+    (670, "Good", "yellow"),
+    (580, "Fair", "orange"),
+    (300, "Poor", "red"),
+]
+
+# Batches this large score faster with the estimator's own predict than the compiled traversal
+NATIVE_GRID_ROWS = 2000
+
+FALLBACK_DEFAULTS = {
+    'monthly_income': 50000,
+    'total_debt': 0,
+    'credit_utilization': 30,
+    'employment_years': 5,
+}
+
+
+def _profile_columns(profiles: List[Dict[str, Any]], defaults: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Pull the given fields out of a list of profiles as float columns"""
+    columns = {}
+    for field, default in defaults.items():
+        values = np.array([user_data.get(field, default) for user_data in profiles], dtype=np.float64)
+        # Explicit nulls (e.g. Optional fields sent as null) fall back to the default
+        values[np.isnan(values)] = default
+        columns[field] = values
+    return columns
+
+
+def score_band(score: int) -> Tuple[int, str, str]:
+    """The SCORE_BANDS entry a score falls in"""
+    for band in SCORE_BANDS:
+        if score >= band[0]:
+            return band
+    return SCORE_BANDS[-1]
+
+
+def _rule_scores(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Rule-based fallback scores for FALLBACK_DEFAULTS columns"""
+    income = columns['monthly_income']
+    utilization = columns['credit_utilization']
+    emp_years = columns['employment_years']
+    debt_ratio = columns['total_debt'] / np.maximum(income, 1)
+    
+    score = np.full(len(income), 650, dtype=np.int64)
+    score += np.select([income > 100000, income > 75000, income < 30000], [50, 30, -40], 0)
+    score += np.select([debt_ratio < 0.3, debt_ratio > 0.6], [40, -60], 0)
+    score += np.select([utilization < 10, utilization > 80], [30, -50], 0)
+    score += np.select([emp_years > 5, emp_years < 2], [20, -30], 0)
+    return np.clip(score, 300, 850)
+
+
+def _is_classifier(model) -> bool:
+    if isinstance(model, CompiledForest):
+        return model.is_classifier
+    return hasattr(model, 'classes_')
+
 
 class GenFiCreditSystem:
     def __init__(self, model_path: str = None):
@@ -21,68 +108,137 @@ class GenFiCreditSystem:
         self.GenFiCreditAgent = None
         self.hf_token = None
         self.weights = None
+        self.scaler = None
+        self.model = None
+        self.scorer = None
+        self.model_path = None
+        self.model_version = "rules-fallback"
+        self._frozen = False
         
         if model_path and os.path.exists(model_path):
             self.load_system(model_path)
     
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"GenFiCreditSystem {self.model_version} is frozen; load a new one instead")
+        super().__setattr__(name, value)
+    
+    def freeze(self):
+        """Make the system read-only once it is published to live traffic"""
+        self._frozen = True
+    
+    @classmethod
+    def from_file(cls, model_path: str) -> 'GenFiCreditSystem':
+        """Build a fully loaded system, raising if the artifact can't be read"""
+        system = cls()
+        system._load(model_path)
+        return system
+    
+    def _load(self, model_path: str):
+        self.model_path = model_path
+        if is_artifact(model_path):
+            # Memory-mapped artifact directory: arrays are shared across workers
+            system_data, manifest = load_artifact(model_path)
+            self.model_version = manifest['content_hash'][:12]
+        else:
+            with open(model_path, 'rb') as f:
+                raw = f.read()
+            system_data = pickle.loads(raw)
+            self.model_version = hashlib.sha256(raw).hexdigest()[:12]
+        
+        if isinstance(system_data, dict) and 'system_type' in system_data:
+            # Load GenFi components
+            self.TransactionAnalyzer = system_data.get('TransactionAnalyzer')
+            self.GenFiScorer = system_data.get('GenFiScorer')
+            self.RepaymentPlanner = system_data.get('RepaymentPlanner')
+            self.FinancialAdvisorLLM = system_data.get('FinancialAdvisorLLM')
+            self.GenFiCreditAgent = system_data.get('GenFiCreditAgent')
+            self.hf_token = system_data.get('hf_token')
+            self.weights = system_data.get('weights', {})
+            self.system_components = system_data
+            
+            print(f"✅ GenFi system loaded successfully from {model_path}")
+            print(f"📊 Components: {list(system_data.keys())}")
+        elif isinstance(system_data, dict) and 'model' in system_data:
+            # model_converter format: one trained model plus its scaler
+            self.system_components = system_data
+            self.model = system_data['model']
+            self.scaler = system_data.get('scaler')
+            self.scorer = self._build_scorer(system_data)
+            print(f"✅ {system_data.get('model_type', type(self.model).__name__)} model loaded from {model_path} "
+                  f"(scorer backend: {type(self.scorer).__name__})")
+        else:
+            # Fallback for old format
+            self.system_components = system_data
+            print(f"⚠️  Loaded data in legacy format from {model_path}")
+    
+    def _build_scorer(self, system_data: Dict[str, Any]):
+        """Prefer the flat-array compiled forest over the native estimator when it matches"""
+        if config.SCORER_BACKEND != 'compiled':
+            return self.model
+        
+        try:
+            compiled = system_data.get('compiled_model') or compile_tree_ensemble(self.model)
+            verify_compiled(self.model, compiled)
+            return compiled
+        except UnsupportedModelError:
+            return self.model
+        except Exception as e:
+            print(f"⚠️  Compiled scorer rejected, using native model: {e}")
+            return self.model
+    
     def load_system(self, model_path: str):
         """Load the GenFi system from file"""
         try:
-            with open(model_path, 'rb') as f:
-                system_data = pickle.load(f)
-            
-            if isinstance(system_data, dict) and 'system_type' in system_data:
-                # Load GenFi components
-                self.TransactionAnalyzer = system_data.get('TransactionAnalyzer')
-                self.GenFiScorer = system_data.get('GenFiScorer')
-                self.RepaymentPlanner = system_data.get('RepaymentPlanner')
-                self.FinancialAdvisorLLM = system_data.get('FinancialAdvisorLLM')
-                self.GenFiCreditAgent = system_data.get('GenFiCreditAgent')
-                self.hf_token = system_data.get('hf_token')
-                self.weights = system_data.get('weights', {})
-                self.system_components = system_data
-                
-                print(f"✅ GenFi system loaded successfully from {model_path}")
-                print(f"📊 Components: {list(system_data.keys())}")
-            else:
-                # Fallback for old format
-                self.system_components = system_data
-                print(f"⚠️  Loaded data in legacy format from {model_path}")
-                
+            self._load(model_path)
         except Exception as e:
             print(f"❌ Error loading GenFi system: {e}")
             self.system_components = None
+            self.model_version = "rules-fallback"
     
     def preprocess_data(self, user_data: Dict[str, Any]) -> np.ndarray:
         """Convert user data to model input format"""
         try:
-            # Example feature engineering - adjust based on your model
-            features = {
-                'age': user_data.get('age', 30),
-                'income': user_data.get('monthly_income', 50000),
-                'credit_score': user_data.get('current_credit_score', 750),
-                'debt_to_income': user_data.get('total_debt', 0) / max(user_data.get('monthly_income', 1), 1),
-                'employment_years': user_data.get('employment_years', 5),
-                'loan_amount': user_data.get('loan_amount', 100000),
-                'loan_tenure': user_data.get('loan_tenure_months', 60),
-                'existing_loans': user_data.get('existing_loans_count', 0),
-                'credit_utilization': user_data.get('credit_utilization', 30) / 100,
-                'payment_history': user_data.get('payment_history_score', 85) / 100,
-            }
-            
-            # Convert to array in the correct order
-            feature_array = np.array([list(features.values())]).reshape(1, -1)
-            
-            # Apply scaling if scaler is available
-            if self.scaler:
-                feature_array = self.scaler.transform(feature_array)
-                
-            return feature_array
+            return self.preprocess_batch([user_data])
             
         except Exception as e:
             print(f"Error preprocessing data: {e}")
             return np.array([[0] * 10])  # Default fallback
     
+    def preprocess_batch(self, profiles: List[Dict[str, Any]]) -> np.ndarray:
+        """Build the (n_profiles, 10) model input matrix in one pass"""
+        with stage('preprocess_data', self.model_version, 'model'):
+            return self._preprocess_batch(profiles)
+    
+    def _preprocess_batch(self, profiles: List[Dict[str, Any]]) -> np.ndarray:
+        columns = _profile_columns(profiles, FEATURE_DEFAULTS)
+        # A missing income counts as 1 in the ratio, as it always has
+        ratio_income = _profile_columns(profiles, {'monthly_income': 1})['monthly_income']
+        return self._feature_matrix(columns, ratio_income)
+    
+    def _feature_matrix(self, columns: Dict[str, np.ndarray], ratio_income: np.ndarray) -> np.ndarray:
+        """Model input matrix from FEATURE_DEFAULTS columns"""
+        # Example feature engineering - adjust based on your model
+        # Columns in the order the model was trained on
+        feature_array = np.column_stack([
+            columns['age'],
+            columns['monthly_income'],
+            columns['current_credit_score'],
+            columns['total_debt'] / np.maximum(ratio_income, 1),
+            columns['employment_years'],
+            columns['loan_amount'],
+            columns['loan_tenure_months'],
+            columns['existing_loans_count'],
+            columns['credit_utilization'] / 100,
+            columns['payment_history_score'] / 100,
+        ])
+        
+        # Apply scaling if scaler is available
+        if self.scaler is not None:
+            feature_array = self.scaler.transform(feature_array)
+        
+        return feature_array
+    
     def genfi_analyze(self, user_profile: Dict[str, Any]) -> Dict[str, Any]:
         """Perform GenFi credit analysis"""
         if self.system_components is None:
@@ -144,23 +300,64 @@ class GenFiCreditSystem:
                 "risk_assessment": "HIGH"
             }
 
-    def predict_credit_score(self, user_data: Dict[str, Any]) -> Tuple[int, float, Dict[str, Any]]:
+    def analyze(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the GenFi agent once and derive the score and explanation from that result"""
+        return self.analyze_batch([user_data])[0]
+    
+    def analyze_batch(self, profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """analyze() for many profiles; model scoring runs as one batched call"""
+        path = 'agent' if self.GenFiCreditAgent else 'fallback'
+        with stage('genfi_analyze', self.model_version, path):
+            genfi_results = [self.genfi_analyze(user_data) for user_data in profiles]
+        
+        if self.GenFiScorer and self.system_components:
+            with stage('predict_credit_score', self.model_version, 'agent'):
+                scored = [self._score(user_data, genfi_result)
+                          for user_data, genfi_result in zip(profiles, genfi_results)]
+            PREDICTIONS.inc(self.model_version, 'agent', amount=len(profiles))
+            predictions, paths = [result for result, _ in scored], [path for _, path in scored]
+        else:
+            predictions, paths = self._score_batch(profiles)
+        
+        return [
+            {
+                'genfi_analysis': genfi_result,
+                'predicted_score': score,
+                'confidence': confidence,
+                'explanation': explanation,
+                'scoring_path': path
+            }
+            for genfi_result, (score, confidence, explanation), path in zip(genfi_results, predictions, paths)
+        ]
+
+    def predict_credit_score(self, user_data: Dict[str, Any],
+                             genfi_result: Optional[Dict[str, Any]] = None) -> Tuple[int, float, Dict[str, Any]]:
         """Predict credit score using GenFi system or fallback"""
+        return self._score(user_data, genfi_result)[0]
+    
+    def _score(self, user_data: Dict[str, Any],
+               genfi_result: Optional[Dict[str, Any]] = None) -> Tuple[Tuple[int, float, Dict[str, Any]], str]:
+        """predict_credit_score() plus the scoring path that produced it (agent, model or fallback)"""
         try:
             if self.GenFiScorer and self.system_components:
-                # Use GenFi scorer
-                genfi_result = self.genfi_analyze(user_data)
+                # Use GenFi scorer, reusing the agent result when the caller already has one
+                if genfi_result is None:
+                    genfi_result = self.genfi_analyze(user_data)
                 score = genfi_result.get('credit_score', 650)
                 confidence = 0.9 if genfi_result.get('status') == 'success' else 0.7
                 explanation = self._generate_explanation(user_data, score, confidence)
-                return int(score), float(confidence), explanation
+                return (int(score), float(confidence), explanation), 'agent'
+            elif self.scorer is not None:
+                # Trained model (compiled forest or native estimator)
+                return self._model_scoring_batch([user_data])[0], 'model'
             else:
                 # Fallback to rule-based scoring
-                return self._fallback_scoring(user_data)
+                return self._fallback_scoring(user_data), 'fallback'
             
         except Exception as e:
             print(f"GenFi prediction error: {e}")
-            return self._fallback_scoring(user_data)
+            SCORING_ERRORS.inc(self.model_version)
+            return self._fallback_scoring(user_data), 'fallback'
     
     def _fallback_scoring(self, user_data: Dict[str, Any]) -> Tuple[int, float, Dict[str, Any]]:
         """Rule-based fallback scoring when model is unavailable"""
@@ -206,34 +403,134 @@ class GenFiCreditSystem:
                 'credit_utilization': 'positive' if utilization < 30 else 'negative',
                 'employment_stability': 'positive' if emp_years > 3 else 'neutral'
             },
-            'recommendations': [
-                'Maintain low credit utilization (under 30%)',
-                'Pay bills on time to improve payment history',
-                'Keep old credit accounts open to maintain credit age'
-            ]
+            'recommendations': list(FALLBACK_RECOMMENDATIONS)
         }
         
         return score, 0.75, explanation
     
+    def predict_credit_scores_batch(self, profiles: List[Dict[str, Any]]) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Predict credit scores for many profiles, same results as predict_credit_score per row"""
+        return self._score_batch(profiles)[0]
+    
+    def _score_batch(self, profiles: List[Dict[str, Any]]) -> Tuple[List[Tuple[int, float, Dict[str, Any]]], List[str]]:
+        """predict_credit_scores_batch() plus the scoring path of each result"""
+        if not profiles:
+            return [], []
+        
+        if self.GenFiScorer and self.system_components:
+            # The GenFi agent is an opaque object, so it can only be called per row
+            with stage('predict_credit_score', self.model_version, 'agent'):
+                scored = [self._score(user_data) for user_data in profiles]
+            PREDICTIONS.inc(self.model_version, 'agent', amount=len(profiles))
+            return [result for result, _ in scored], [path for _, path in scored]
+        
+        if self.scorer is not None:
+            try:
+                with stage('predict_credit_score', self.model_version, 'model'):
+                    results = self._model_scoring_batch(profiles)
+                PREDICTIONS.inc(self.model_version, 'model', amount=len(profiles))
+                return results, ['model'] * len(profiles)
+            except Exception as e:
+                print(f"GenFi batch prediction error: {e}")
+                if len(profiles) > 1:
+                    # Micro-batches mix requests: retry row by row so only the bad profile falls back
+                    scored = [self._score_batch([user_data]) for user_data in profiles]
+                    return [results[0] for results, _ in scored], [paths[0] for _, paths in scored]
+                SCORING_ERRORS.inc(self.model_version)
+        
+        with stage('predict_credit_score', self.model_version, 'fallback'):
+            results = self._fallback_scoring_batch(profiles)
+        PREDICTIONS.inc(self.model_version, 'fallback', amount=len(profiles))
+        return results, ['fallback'] * len(profiles)
+    
+    def _scorer_for(self, rows: int):
+        """Scorer for a batch of `rows` profiles: compiled when small, the native estimator when large"""
+        return self.model if rows >= NATIVE_GRID_ROWS else self.scorer
+    
+    def score_grid(self, columns: Dict[str, np.ndarray], ratio_income: np.ndarray) -> Tuple[np.ndarray, str]:
+        """Scores for FEATURE_DEFAULTS columns (e.g. a what-if grid) and the scoring path used
+        
+        The model and rule-based paths score every row in one vectorized call
+        and skip the per-row explanations; the GenFi agent can only go row by row.
+        """
+        if self.GenFiScorer and self.system_components:
+            with stage('score_grid', self.model_version, 'agent'):
+                fields = list(columns)
+                rows = zip(*(columns[field].tolist() for field in fields))
+                scores = [self.predict_credit_score(dict(zip(fields, row)))[0] for row in rows]
+            return np.array(scores, dtype=np.int64), 'agent'
+        
+        if self.scorer is not None:
+            try:
+                with stage('score_grid', self.model_version, 'model'):
+                    scores, _ = self._model_scores(self._feature_matrix(columns, ratio_income),
+                                                   self._scorer_for(len(ratio_income)))
+                return scores.astype(np.int64), 'model'
+            except Exception as e:
+                print(f"GenFi grid scoring error: {e}")
+                SCORING_ERRORS.inc(self.model_version)
+        
+        with stage('score_grid', self.model_version, 'fallback'):
+            return _rule_scores(columns), 'fallback'
+    
+    def _model_scores(self, X: np.ndarray, scorer=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Integer scores and confidences for a model input matrix"""
+        scorer = scorer if scorer is not None else self.scorer
+        if _is_classifier(scorer):
+            # Classifiers are taken to predict P(good borrower) as their last class
+            p_good = np.asarray(scorer.predict_proba(X))[:, -1]
+            scores = np.rint(300 + 550 * p_good)
+            confidence = np.maximum(p_good, 1 - p_good)
+        else:
+            scores = np.rint(np.clip(np.asarray(scorer.predict(X), dtype=np.float64).reshape(-1), 300, 850))
+            confidence = np.full(len(X), 0.85)
+        return scores, confidence
+    
+    def _model_scoring_batch(self, profiles: List[Dict[str, Any]]) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Score profiles with the trained model in a single predict call"""
+        scores, confidence = self._model_scores(self.preprocess_batch(profiles), self._scorer_for(len(profiles)))
+        
+        return [
+            (score, conf, self._generate_explanation(user_data, score, conf))
+            for user_data, score, conf in zip(profiles, scores.astype(int).tolist(), confidence.tolist())
+        ]
+    
+    def _fallback_scoring_batch(self, profiles: List[Dict[str, Any]]) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Vectorized version of _fallback_scoring over a whole batch of profiles"""
+        columns = _profile_columns(profiles, FALLBACK_DEFAULTS)
+        income = columns['monthly_income']
+        utilization = columns['credit_utilization']
+        emp_years = columns['employment_years']
+        debt_ratio = columns['total_debt'] / np.maximum(income, 1)
+        score = _rule_scores(columns)
+        
+        factor_columns = zip(
+            score.tolist(),
+            np.where(income > 50000, 'positive', 'negative').tolist(),
+            np.where(debt_ratio < 0.4, 'positive', 'negative').tolist(),
+            np.where(utilization < 30, 'positive', 'negative').tolist(),
+            np.where(emp_years > 3, 'positive', 'neutral').tolist()
+        )
+        
+        results = []
+        for row_score, income_level, debt_level, utilization_level, employment_level in factor_columns:
+            explanation = {
+                'factors': {
+                    'income_level': income_level,
+                    'debt_ratio': debt_level,
+                    'credit_utilization': utilization_level,
+                    'employment_stability': employment_level
+                },
+                'recommendations': list(FALLBACK_RECOMMENDATIONS)
+            }
+            results.append((row_score, 0.75, explanation))
+        
+        return results
+    
     def _generate_explanation(self, user_data: Dict[str, Any], score: int, confidence: float) -> Dict[str, Any]:
         """Generate explanation for the credit score"""
         
-        # Score categories
-        if score >= 800:
-            category = "Excellent"
-            color = "green"
-        elif score >= 740:
-            category = "Very Good"
-            color = "light_green"
-        elif score >= 670:
-            category = "Good"
-            color = "yellow"
-        elif score >= 580:
-            category = "Fair"
-            color = "orange"
-        else:
-            category = "Poor"
-            color = "red"
+        _, category, color = score_band(score)
         
         return {
             'score_category': category,
@@ -247,20 +544,23 @@ class GenFiCreditSystem:
     def _identify_key_factors(self, user_data: Dict[str, Any]) -> list:
         """Identify key factors affecting the score"""
         factors = []
+        # Explicit nulls count as the defaults, as in _profile_columns
+        values = {field: default if user_data.get(field) is None else user_data[field]
+                  for field, default in FALLBACK_DEFAULTS.items()}
         
-        income = user_data.get('monthly_income', 50000)
+        income = values['monthly_income']
         if income > 75000:
             factors.append("Strong income level")
         elif income < 30000:
             factors.append("Low income may limit credit options")
         
-        debt_ratio = user_data.get('total_debt', 0) / max(income, 1)
+        debt_ratio = values['total_debt'] / max(income, 1)
         if debt_ratio > 0.5:
             factors.append("High debt-to-income ratio")
         elif debt_ratio < 0.3:
             factors.append("Healthy debt-to-income ratio")
         
-        utilization = user_data.get('credit_utilization', 30)
+        utilization = values['credit_utilization']
         if utilization > 80:
             factors.append("High credit utilization")
         elif utilization < 10:
@@ -297,7 +597,11 @@ class GenFiCreditSystem:
         """Get financial advice using GenFi FinancialAdvisorLLM"""
         try:
             if self.FinancialAdvisorLLM:
-                advice = self.FinancialAdvisorLLM.get_advice(query, user_context)
+                if genfi_pool is not None and genfi_pool.model_version == self.model_version:
+                    # The advisor is plain Python too; run it in the workers, off this process's GIL
+                    advice = genfi_pool.get_advice(query, user_context)
+                else:
+                    advice = self.FinancialAdvisorLLM.get_advice(query, user_context)
                 return {
                     "advice": advice,
                     "status": "success"
@@ -316,23 +620,110 @@ class GenFiCreditSystem:
             }
 
 
-# Global GenFi system instance
-genfi_system = GenFiCreditSystem()
+WARM_UP_PROFILE = {
+    'age': 30, 'monthly_income': 50000, 'current_credit_score': 650, 'total_debt': 10000,
+    'employment_years': 5, 'loan_amount': 100000, 'loan_tenure_months': 60,
+    'existing_loans_count': 0, 'credit_utilization': 30, 'payment_history_score': 85
+}
+
+def validate_system(system: GenFiCreditSystem):
+    """Smoke-score a freshly loaded system before it is allowed to serve traffic"""
+    analysis = system.analyze(WARM_UP_PROFILE)
+    score = analysis['predicted_score']
+    if not isinstance(score, int) or not 300 <= score <= 900:
+        raise ModelValidationError(f"Smoke score out of range: {score!r}")
+    if system.GenFiCreditAgent and analysis['genfi_analysis'].get('status') != 'success':
+        raise ModelValidationError(f"Smoke analysis failed: {analysis['genfi_analysis'].get('error')}")
+
+# With GENFI_EXECUTION_MODE=process, GenFi agent inference runs in worker processes
+genfi_pool = GenFiProcessPool(
+    workers=config.GENFI_POOL_WORKERS,
+    task_timeout=config.GENFI_POOL_TASK_TIMEOUT_SECONDS
+) if config.GENFI_EXECUTION_MODE == 'process' else None
+
+def _uses_agent(system: GenFiCreditSystem) -> bool:
+    return bool(system.system_components and (system.GenFiCreditAgent or system.GenFiScorer))
+
+def _on_model_published(system: GenFiCreditSystem):
+    if genfi_pool is None:
+        return
+    # Only the opaque agent objects need other processes; vectorized scoring stays inline
+    if _uses_agent(system):
+        genfi_pool.start(system.model_path, system.model_version)
+        print(f"✅ GenFi process pool ({genfi_pool.workers} workers) serving {system.model_version}")
+    else:
+        genfi_pool.stop()
+
+# The live GenFi system is whatever the registry currently publishes; it starts
+# out as the rule-based fallback.
+_fallback_system = GenFiCreditSystem()
+_fallback_system.freeze()
+model_registry = ModelRegistry(
+    initial=_fallback_system,
+    loader=GenFiCreditSystem.from_file,
+    validator=validate_system,
+    history_size=config.MODEL_HISTORY_SIZE,
+    on_publish=_on_model_published
+)
+
+def current_system() -> GenFiCreditSystem:
+    return model_registry.active
+
+# Repeat analyses of the same profile (e.g. dashboard refreshes) are served from memory.
+# Keys include the model version, so a reload never serves stale results.
+_analysis_cache = TTLCache(maxsize=config.ANALYSIS_CACHE_SIZE, ttl=config.ANALYSIS_CACHE_TTL_SECONDS)
 
 def load_genfi_system(model_path: str):
-    """Load your GenFi system from pickle file"""
-    global genfi_system
-    genfi_system.load_system(model_path)
+    """Load your GenFi system from pickle file and publish it (blocking)"""
+    return model_registry.load(model_path)
     
+def predict_credit_scores_batch(profiles: List[Dict[str, Any]],
+                                system: Optional[GenFiCreditSystem] = None) -> List[Tuple[int, float, Dict[str, Any]]]:
+    """Score a batch of profiles in one call"""
+    system = system or current_system()
+    return system.predict_credit_scores_batch(profiles)
+
 def analyze_credit_profile(user_data: Dict[str, Any]) -> Dict[str, Any]:
     """Main function to get GenFi credit analysis"""
-    genfi_result = genfi_system.genfi_analyze(user_data)
-    score, confidence, explanation = genfi_system.predict_credit_score(user_data)
+    return analyze_credit_profiles([user_data])[0]
+
+def analyze_credit_profiles(profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """GenFi credit analysis for a batch of profiles (used by the micro-batcher)"""
+    system = current_system()
+    cache_keys = [canonical_hash(user_data, system.model_version) for user_data in profiles]
+    analyses = [_analysis_cache.get(key) for key in cache_keys]
+    
+    misses = [i for i, analysis in enumerate(analyses) if analysis is None]
+    if misses:
+        batch = [profiles[i] for i in misses]
+        if genfi_pool is not None and genfi_pool.model_version == system.model_version:
+            fresh = genfi_pool.analyze_batch(batch)
+        else:
+            # Inline mode, or the pool is still warming up on a new version
+            fresh = system.analyze_batch(batch)
+        # Rules are the normal path only for a system with neither an agent nor a model
+        rules_only = system.scorer is None and not system.system_components
+        for i, analysis in zip(misses, fresh):
+            analyses[i] = analysis
+            # Only cache what the live scorer produced, not degraded fallbacks or transient agent failures
+            path = analysis.get('scoring_path')
+            if (path == 'model' or (path == 'fallback' and rules_only)
+                    or (path == 'agent' and analysis['genfi_analysis'].get('status') == 'success')):
+                _analysis_cache.set(cache_keys[i], analysis)
     
-    return {
-        'genfi_analysis': genfi_result,
-        'predicted_score': score,
-        'confidence': confidence,
-        'explanation': explanation,
-        'timestamp': pd.Timestamp.now().isoformat()
-    }
\ No newline at end of file
+    timestamp = datetime.now().isoformat()
+    return [
+        {
+            **analysis,
+            'model_version': system.model_version,
+            'timestamp': timestamp
+        }
+        for analysis in analyses
+    ]
+
+def warm_up():
+    """Exercise the scoring code paths once so the first real request doesn't pay for it"""
+    system = current_system()
+    system.preprocess_data(WARM_UP_PROFILE)
+    system.analyze(WARM_UP_PROFILE)
+    system.predict_credit_scores_batch([WARM_UP_PROFILE] * 2)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Dict, Any
+
+class InsurancePolicy(BaseModel):
+    type: str
+    coverage: int
+    premium: int
+    provider: str
+
+class Profile(BaseModel):
+    age: int
+    dependents: int
+    income: int
+    city: str
+
+class AAData(BaseModel):
+    user_id: str
+    profile: Profile
+    insurances: List[InsurancePolicy]
+    accounts: List[Dict[str, Any]] = []
@@ -0,0 +1,121 @@
+"""
+Versioned model registry with background loading and atomic hot-swap
+
+New artifacts are loaded and smoke-tested on a background thread; only a
+fully built, frozen system is ever published. Publishing is a single
+reference assignment, so a request that grabbed `registry.active` keeps a
+consistent system for its whole lifetime, and live traffic never waits on
+a reload. The last few versions are kept for instant rollback.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ModelValidationError(Exception):
+    """Raised when a freshly loaded model fails its smoke test"""
+
+
+class ModelRegistry:
+    MAX_JOBS = 20
+
+    def __init__(self, initial: Any, loader: Callable[[str], Any],
+                 validator: Callable[[Any], None], history_size: int = 2,
+                 on_publish: Optional[Callable[[Any], None]] = None):
+        self._active = initial
+        self._on_publish = on_publish
+        self._previous = deque(maxlen=history_size)
+        self._loader = loader
+        self._validator = validator
+        self._swap_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @property
+    def active(self):
+        """The currently published system; grab it once per request"""
+        return self._active
+
+    def load(self, model_path: str):
+        """Load, validate and publish an artifact synchronously; raises on failure"""
+        system = self._loader(model_path)
+        self._validator(system)
+        system.freeze()
+        self._publish(system)
+        return system
+
+    def load_in_background(self, model_path: str) -> Dict[str, Any]:
+        """Start loading an artifact off the request path and return the job record"""
+        job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "model_path": model_path,
+            "status": "loading",
+            "model_version": None,
+            "error": None,
+            "started_at": time.time(),
+            "finished_at": None
+        }
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.MAX_JOBS:
+            self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run_job, job)
+        return dict(job)
+
+    def _run_job(self, job: Dict[str, Any]):
+        try:
+            system = self.load(job["model_path"])
+            job.update(status="ready", model_version=system.model_version)
+            print(f"✅ Model {system.model_version} published from {job['model_path']}")
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+            print(f"❌ Model load from {job['model_path']} failed: {e}")
+        finally:
+            job["finished_at"] = time.time()
+
+    def _publish(self, system):
+        with self._swap_lock:
+            self._previous.append(self._active)
+            self._active = system
+        self._notify(system)
+
+    def _notify(self, system):
+        # Hooks (e.g. restarting worker processes) run on the loader thread, in publish order
+        if self._on_publish is not None:
+            self._executor.submit(self._run_hook, system)
+
+    def _run_hook(self, system):
+        try:
+            self._on_publish(system)
+        except Exception as e:
+            print(f"⚠️  Model publish hook failed for {system.model_version}: {e}")
+
+    def rollback(self, model_version: Optional[str] = None):
+        """Re-publish the most recent previous version (or a specific one)"""
+        with self._swap_lock:
+            candidates = [s for s in self._previous if model_version in (None, s.model_version)]
+            if not candidates:
+                wanted = f" {model_version}" if model_version else ""
+                raise LookupError(f"No previous model version{wanted} to roll back to")
+
+            target = candidates[-1]
+            self._previous.remove(target)
+            self._previous.append(self._active)
+            self._active = target
+        self._notify(target)
+        return target
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active_version": self._active.model_version,
+            "previous_versions": [s.model_version for s in reversed(self._previous)],
+            "jobs": [dict(job) for job in reversed(self._jobs.values())]
+        }
@@ -0,0 +1,170 @@
+"""
+Process-pool execution for CPU-bound GenFi agent inference
+
+GenFiCreditAgent.analyze_user, GenFiScorer and FinancialAdvisorLLM are
+arbitrary Python objects; on uvicorn's threadpool they all fight over one
+GIL. With GENFI_EXECUTION_MODE=process the published model is also loaded
+once into each of GENFI_POOL_WORKERS worker processes, and agent analyses
+are dispatched there in micro-batches (one pickle round trip per batch, not
+per request), so throughput scales with cores. FinancialAdvisorLLM.get_advice
+calls run there too.
+
+A broken pool (a worker crashed or was OOM-killed) is rebuilt automatically,
+and a background health check pings the workers periodically. A worker that
+is merely slow to answer a ping is reported, not restarted.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+# Per-worker state, set by _init_worker
+_worker_system = None
+
+
+def _init_worker(model_path: Optional[str]):
+    global _worker_system
+    from models.credit_model import GenFiCreditSystem
+
+    _worker_system = GenFiCreditSystem.from_file(model_path) if model_path else GenFiCreditSystem()
+
+
+def _analyze_batch(profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _worker_system.analyze_batch(profiles)
+
+
+def _get_advice(query: str, user_context: Optional[Dict[str, Any]]) -> Any:
+    return _worker_system.FinancialAdvisorLLM.get_advice(query, user_context)
+
+
+def _ping() -> Dict[str, Any]:
+    return {"pid": os.getpid(), "model_version": _worker_system.model_version}
+
+
+class GenFiProcessPool:
+    def __init__(self, workers: int, task_timeout: float = 30.0, health_interval: float = 15.0):
+        self.workers = workers
+        self.task_timeout = task_timeout
+        self.health_interval = health_interval
+        self.model_path = None
+        self.model_version = None
+        self.restarts = 0
+        self.last_health = None
+        self._executor = None
+        # Re-entrant: _restart holds it across start() so concurrent restarts don't stack up
+        self._lock = threading.RLock()
+        self._health_thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self, model_path: str, model_version: str):
+        """(Re)build the pool with every worker loading `model_path` once"""
+        # spawn, not fork: the parent holds threads (uvicorn, gRPC) that don't survive a fork
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path,)
+        )
+        # Spawn every worker and load the model before the new pool takes traffic
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result(timeout=self.task_timeout * 4)
+
+        with self._lock:
+            old, self._executor = self._executor, executor
+            self.model_path = model_path
+            self.model_version = model_version
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=False)
+
+        if self._health_thread is None and self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, name="genfi-pool-health", daemon=True)
+            self._health_thread.start()
+
+    def stop(self):
+        with self._lock:
+            old, self._executor = self._executor, None
+            self.model_version = None
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, broken):
+        """Rebuild the pool, unless `broken` was already replaced or the pool was stopped"""
+        with self._lock:
+            if self._executor is None or self._executor is not broken:
+                return
+            print(f"⚠️  GenFi process pool broken, restarting with {self.model_path}")
+            self.restarts += 1
+            self.start(self.model_path, self.model_version)
+
+    @staticmethod
+    def _dead_workers(executor) -> List[int]:
+        processes = getattr(executor, "_processes", None) or {}
+        return [pid for pid, process in list(processes.items()) if not process.is_alive()]
+
+    def _call(self, fn, *args):
+        for attempt in range(2):
+            executor = self._executor
+            if executor is None:
+                raise RuntimeError("GenFi process pool is not running")
+            try:
+                return executor.submit(fn, *args).result(timeout=self.task_timeout)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                self._restart(executor)
+
+    def analyze_batch(self, profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call(_analyze_batch, profiles)
+
+    def get_advice(self, query: str, user_context: Optional[Dict[str, Any]] = None) -> Any:
+        """FinancialAdvisorLLM.get_advice in a worker"""
+        return self._call(_get_advice, query, user_context)
+
+    def health_check(self) -> Dict[str, Any]:
+        """Ping the workers; rebuilds the pool only if it is broken or a worker died"""
+        executor = self._executor
+        if executor is None:
+            return {"running": False}
+
+        workers, healthy = {}, False
+        dead = self._dead_workers(executor)
+        if dead:
+            print(f"⚠️  GenFi pool workers {dead} died")
+            self._restart(executor)
+        else:
+            try:
+                pings = [executor.submit(_ping) for _ in range(self.workers)]
+                workers = {p["pid"]: p["model_version"] for p in (f.result(timeout=self.task_timeout) for f in pings)}
+                healthy = True
+            except TimeoutError:
+                # Busy workers are slow, not broken; restarting would drop their in-flight batches
+                print(f"⚠️  GenFi process pool health check timed out after {self.task_timeout}s")
+            except BrokenProcessPool as e:
+                print(f"⚠️  GenFi process pool health check failed: {e}")
+                self._restart(executor)
+
+        self.last_health = time.time()
+        return {
+            "running": True,
+            "healthy": healthy,
+            "workers": self.workers,
+            "model_version": self.model_version,
+            "responding_pids": sorted(workers),
+            "restarts": self.restarts,
+        }
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                if self.running:
+                    self.health_check()
+            except Exception as e:
+                print(f"❌ GenFi process pool health check error: {e}")
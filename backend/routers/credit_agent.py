@@ -1,11 +1,30 @@
-from fastapi import APIRouter, HTTPException
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse
 from core.scoring_engine import compute_genfi_score
+from core.metrics import TimedRoute
+from core.micro_batcher import MicroBatcher
+from core.responses import FastJSONResponse
 from core.planner_engine import generate_repayment_plan
-from models.credit_model import analyze_credit_profile, load_genfi_system
-from pydantic import BaseModel
-from typing import Optional
+from core.sensitivity import MAX_LEVER_VALUES, sweep
+from core.transaction_store import from_day, transaction_store
+from models.credit_model import (
+    analyze_credit_profile, analyze_credit_profiles, current_system, genfi_pool, load_genfi_system,
+    model_registry, predict_credit_scores_batch
+)
+from config import config
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+router = APIRouter(prefix="/api/credit", tags=["Credit Agent"], route_class=TimedRoute)
 
-router = APIRouter(prefix="/api/credit", tags=["Credit Agent"])
+# Concurrent /predict and /chat-analysis calls share batched model calls
+prediction_batcher = MicroBatcher(
+    analyze_credit_profiles,
+    max_batch_size=config.PREDICT_MICRO_BATCH_SIZE,
+    max_wait_ms=config.PREDICT_BATCH_WINDOW_MS
+)
 
 class CreditProfile(BaseModel):
     age: Optional[int] = 30
@@ -19,14 +38,67 @@ class CreditProfile(BaseModel):
     credit_utilization: Optional[float] = 30
     payment_history_score: Optional[int] = 85
 
+class CreditProfileBatch(BaseModel):
+    profiles: List[CreditProfile]
+
+class LeverRange(BaseModel):
+    # Either explicit values or an evenly spaced min..max range
+    values: Optional[List[float]] = Field(default=None, max_length=MAX_LEVER_VALUES)
+    min: Optional[float] = None
+    max: Optional[float] = None
+    steps: int = Field(default=11, ge=2, le=MAX_LEVER_VALUES)
+    # Effort of one unit of change, for ranking changes (defaults per lever)
+    unit: Optional[float] = Field(default=None, gt=0)
+
+class WhatIfRequest(BaseModel):
+    profile: CreditProfile
+    levers: Dict[str, LeverRange]
+
+class TransactionIn(BaseModel):
+    id: Optional[int] = None
+    amount: float
+    date: str
+    type: Optional[str] = "debit"
+    receiver: Optional[str] = None
+
 @router.post("/load-genfi-system")
-def load_genfi_model(model_path: str):
-    """Load your GenFi Credit Agent system from pickle file"""
+def load_genfi_model(model_path: str, wait: bool = False):
+    """Load your GenFi Credit Agent system from pickle file.
+
+    By default the artifact is loaded, smoke-tested and swapped in on a background
+    thread; poll /model-status for the job. Pass wait=true to block until it is live.
+    """
+    if wait:
+        try:
+            system = load_genfi_system(model_path)
+            return {"message": "GenFi system loaded successfully", "model_path": model_path,
+                    "model_version": system.model_version}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error loading GenFi system: {str(e)}")
+
+    job = model_registry.load_in_background(model_path)
+    return JSONResponse(status_code=202, content={"message": "GenFi system load started", **job})
+
+@router.get("/model-status")
+def get_model_status():
+    """Active model version, rollback candidates and recent load jobs"""
+    return model_registry.status()
+
+@router.get("/pool-status")
+def get_pool_status():
+    """Health of the GenFi worker-process pool (GENFI_EXECUTION_MODE=process)"""
+    if genfi_pool is None:
+        return {"execution_mode": "inline"}
+    return {"execution_mode": "process", **genfi_pool.health_check()}
+
+@router.post("/rollback-model")
+def rollback_model(model_version: Optional[str] = None):
+    """Swap back to the previous model version (or a specific retained one)"""
     try:
-        load_genfi_system(model_path)
-        return {"message": "GenFi system loaded successfully", "model_path": model_path}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error loading GenFi system: {str(e)}")
+        system = model_registry.rollback(model_version)
+        return {"message": "Rolled back GenFi system", "model_version": system.model_version}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/genfi-analyze")
 def genfi_credit_analyze(profile: dict):
@@ -41,6 +113,7 @@ def genfi_credit_analyze(profile: dict):
             "confidence": analysis_result['confidence'],
             "explanation": analysis_result['explanation'],
             "timestamp": analysis_result['timestamp'],
+            "model_version": analysis_result['model_version'],
             "system": "GenFi Credit Agent"
         }
         
@@ -49,39 +122,139 @@ def genfi_credit_analyze(profile: dict):
 
 @router.post("/analyze")
 def analyze_credit(profile: dict):
-    """Original analysis endpoint (backward compatibility)"""
+    """Original analysis endpoint (backward compatibility)
+
+    If the profile has a user_id with transaction history, income and expenses
+    come from that history instead of the request.
+    """
+    profile = transaction_store.with_aggregates(profile)
     score, breakdown = compute_genfi_score(profile)
     plan = generate_repayment_plan(profile, score)
     return {"genfi_score": score, "breakdown": breakdown, "plan": plan}
 
+@router.get("/transactions/{user_id}")
+def get_transaction_summary(user_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                            top: int = 5):
+    """Monthly buckets, credit/debit split and top UPI receivers from the user's transactions"""
+    user = transaction_store.get(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail=f"No transactions for user {user_id}")
+    try:
+        return FastJSONResponse({"user_id": user_id, **user.summary(start, end, top)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+
+@router.post("/transactions/{user_id}")
+def ingest_transactions(user_id: str, transactions: List[TransactionIn]):
+    """Ingest new bank/UPI transactions; rolling aggregates are updated immediately"""
+    try:
+        count = transaction_store.ingest(user_id, [t.model_dump(exclude_none=True) for t in transactions])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid transaction: {e}")
+    return {"user_id": user_id, "ingested": count, "aggregates": transaction_store.aggregates(user_id).snapshot()}
+
+@router.get("/aggregates/{user_id}")
+def get_aggregates(user_id: str):
+    """Rolling 30/90/365-day income, expenses, expense ratio and volatility
+
+    Windows end on the later of the last transaction (`as_of`) and today (`evaluated_on`).
+    """
+    user = transaction_store.aggregates(user_id)
+    if user is None or user.as_of is None:
+        raise HTTPException(status_code=404, detail=f"No transactions for user {user_id}")
+    read_day = user.read_day()
+    return {"user_id": user_id, "as_of": str(from_day(user.as_of)), "evaluated_on": str(from_day(read_day)),
+            "windows": user.snapshot(read_day)}
+
 @router.post("/predict")
-def predict_credit(profile: CreditProfile):
+async def predict_credit(profile: CreditProfile):
     """New ML-powered credit prediction"""
     try:
         # Convert Pydantic model to dict
-        user_data = profile.dict()
+        user_data = profile.model_dump()
         
         # Get prediction from GenFi system
-        prediction_result = analyze_credit_profile(user_data)
+        prediction_result = await prediction_batcher.submit(user_data)
         
         # Generate repayment plan based on prediction
         plan = generate_repayment_plan(user_data, prediction_result['predicted_score'])
         
-        return {
+        # Already plain JSON data: serialize directly, skipping jsonable_encoder
+        return FastJSONResponse({
             "genfi_prediction": prediction_result,
             "repayment_plan": plan,
-            "model_used": "GenFi Credit Agent System"
-        }
+            "model_used": "GenFi Credit Agent System",
+            "model_version": prediction_result['model_version']
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+@router.post("/predict-batch")
+def predict_credit_batch(batch: CreditProfileBatch):
+    """Score many credit profiles in a single call"""
+    if len(batch.profiles) > config.PREDICT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.profiles)} profiles (max {config.PREDICT_BATCH_MAX_SIZE})"
+        )
+    
+    try:
+        user_data = [profile.model_dump() for profile in batch.profiles]
+        system = current_system()
+        results = predict_credit_scores_batch(user_data, system)
+        
+        return FastJSONResponse({
+            "predictions": [
+                {"predicted_score": score, "confidence": confidence, "explanation": explanation}
+                for score, confidence, explanation in results
+            ],
+            "count": len(results),
+            "model_used": "GenFi Credit Agent System",
+            "model_version": system.model_version
+        })
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
+
+@router.post("/what-if")
+def what_if_sensitivity(request: WhatIfRequest):
+    """Score every combination of the given lever values and find the cheapest change that reaches the next band"""
+    levers = {
+        name: {"values": lever.values, "low": lever.min, "high": lever.max, "steps": lever.steps, "unit": lever.unit}
+        for name, lever in request.levers.items()
+    }
+    try:
+        result = sweep(current_system(), request.profile.model_dump(), levers,
+                       max_points=config.WHAT_IF_MAX_GRID_POINTS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(result)
+
+@router.get("/batcher-stats")
+def get_batcher_stats():
+    """Micro-batcher settings and batch-size histogram for /predict and /chat-analysis"""
+    return prediction_batcher.stats()
+
+@router.post("/batcher-settings")
+def update_batcher_settings(max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                            x_admin_token: Optional[str] = Header(default=None)):
+    """Tune the micro-batching window at runtime (max_wait_ms=0 disables batching); needs ADMIN_TOKEN"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if max_batch_size is not None:
+        max_batch_size = min(max_batch_size, config.PREDICT_BATCH_MAX_SIZE)
+    prediction_batcher.configure(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    return prediction_batcher.stats()
+
 @router.post("/chat-analysis")
-def chat_credit_analysis(profile: CreditProfile, question: Optional[str] = ""):
+async def chat_credit_analysis(profile: CreditProfile, question: Optional[str] = ""):
     """Enhanced analysis for chatbot integration"""
     try:
-        user_data = profile.dict()
-        prediction_result = analyze_credit_profile(user_data)
+        user_data = profile.model_dump()
+        prediction_result = await prediction_batcher.submit(user_data)
         
         # Generate conversational response
         score = prediction_result['predicted_score']
@@ -95,10 +268,11 @@ def chat_credit_analysis(profile: CreditProfile, question: Optional[str] = ""):
             "risk_level": explanation['risk_level'],
             "key_insights": explanation['key_factors'],
             "recommendations": explanation['improvement_tips'],
-            "conversation_response": _generate_chat_response(score, explanation, question)
+            "conversation_response": _generate_chat_response(score, explanation, question),
+            "model_version": prediction_result['model_version']
         }
         
-        return response
+        return FastJSONResponse(response)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat analysis error: {str(e)}")
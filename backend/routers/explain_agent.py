@@ -1,9 +1,10 @@
 from fastapi import APIRouter
+from core.metrics import TimedRoute
 from services.llm_service import generate_explanation
 
-router = APIRouter(prefix="/api/explain", tags=["Explain Agent"])
+router = APIRouter(prefix="/api/explain", tags=["Explain Agent"], route_class=TimedRoute)
 
 @router.post("/score")
-def explain_score(score_data: dict):
-    explanation = generate_explanation(score_data)
+async def explain_score(score_data: dict):
+    explanation = await generate_explanation(score_data)
     return {"explanation": explanation}
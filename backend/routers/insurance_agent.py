@@ -1,145 +1,87 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from core.insurance_rules import insurance_rules
+from core.metrics import TimedRoute, timed
+from core.responses import dumps
+from models.insurance import AAData, InsurancePolicy, Profile
+from services.aa_repository import aa_repository
+from services.chat_sessions import ChatSession, chat_sessions
+from services.llm_client import LLMUnavailable, deadline_after, llm_client
 
-router = APIRouter(prefix="/api/insurance", tags=["Insurance Agent"])
-
-# ---------------------------------------------------
-# GEMINI INITIALIZATION
-# ---------------------------------------------------
-
-import google.generativeai as genai
-from config import config
-
-genai.configure(api_key=config.GEMINI_API_KEY)
-
-try:
-    # Try the most available model first
-    gemini_model = genai.GenerativeModel("gemini-pro")
-    GEMINI_AVAILABLE = True
-    print("✅ Gemini Pro initialized successfully")
-except Exception as e:
-    print(f"⚠️  Gemini Pro model initialization error: {e}")
-    try:
-        # Try newer model as fallback
-        gemini_model = genai.GenerativeModel("gemini-1.5-flash")
-        GEMINI_AVAILABLE = True
-        print("✅ Gemini 1.5 Flash initialized as fallback")
-    except Exception as e2:
-        print(f"❌ All Gemini models failed: {e2}")
-        GEMINI_AVAILABLE = False
-        gemini_model = None
+router = APIRouter(prefix="/api/insurance", tags=["Insurance Agent"], route_class=TimedRoute)
 
 # ---------------------------------------------------
 # MODELS
 # ---------------------------------------------------
 
-class InsurancePolicy(BaseModel):
-    type: str
-    coverage: int
-    premium: int
-    provider: str
+class ChatRequest(BaseModel):
+    user_id: str
+    message: str
+    history: List[Dict[str, str]] = []
+    # When set, the server keeps the conversation and `history` is ignored
+    session_id: Optional[str] = None
 
-class Profile(BaseModel):
-    age: int
-    dependents: int
-    income: int
-    city: str
+class Recommendation(BaseModel):
+    type: str
+    priority: str
+    reason: str
 
-class AAData(BaseModel):
+class AdviceResponse(BaseModel):
     user_id: str
+    existing_policies: List[InsurancePolicy]
+    recommendations: List[Recommendation]
     profile: Profile
-    insurances: List[InsurancePolicy]
-    accounts: List[Dict[str, Any]] = []
 
-class ChatRequest(BaseModel):
-    user_id: str
+class AddPolicyResponse(BaseModel):
     message: str
-    history: List[Dict[str, str]] = []
+    policy: InsurancePolicy
+
+class BulkAdviceRequest(BaseModel):
+    user_ids: Optional[List[str]] = None
+    prefix: str = ""
+    after: str = ""
+    limit: Optional[int] = None
+    # Only emit users that have at least one recommendation
+    only_gaps: bool = False
+    page_size: int = 500
 
 class ChatResponse(BaseModel):
     reply: str
     history: List[Dict[str, str]]
-
-# ---------------------------------------------------
-# FAKE AA DB
-# ---------------------------------------------------
-
-FAKE_AA_DB = {
-    "user1": AAData(
-        user_id="user1",
-        profile=Profile(age=23, dependents=0, income=600000, city="mumbai"),
-        insurances=[
-            InsurancePolicy(
-                type="health",
-                coverage=300000,
-                premium=12000,
-                provider="care health"
-            ),
-            InsurancePolicy(
-                type="life",
-                coverage=5000000,      # example 50 lakh term plan
-                premium=9000,          # example premium
-                provider="lic"
-            )
-        ],
-        accounts=[{"type": "savings", "balance": 80000}]
-    )
-}
+    session_id: Optional[str] = None
 
 # ---------------------------------------------------
 # RECOMMENDATION ENGINE
 # ---------------------------------------------------
 
-def has_policy(aa: AAData, policy_type: str):
-    for p in aa.insurances:
-        if p.type.lower() == policy_type.lower():
-            return p
-    return None
-
 def build_recommendations(aa: AAData):
-    recs = []
-    profile = aa.profile
-
-    if not has_policy(aa, "health"):
-        recs.append({
-            "type": "health",
-            "priority": "high",
-            "reason": "A basic health plan protects against unexpected medical expenses."
-        })
-
-    if profile.dependents > 0:
-        recs.append({
-            "type": "life",
-            "priority": "high",
-            "reason": f"You have {profile.dependents} dependents. Term insurance is recommended."
-        })
-
-    return recs
+    # Rules are declared in core/insurance_rules.py and evaluated as column predicates
+    return insurance_rules.recommend(aa)
 
 # ---------------------------------------------------
-# ENDPOINTS
+# CHAT PROMPT
 # ---------------------------------------------------
 
-@router.post("/chat", response_model=ChatResponse)
-def chat_with_insurance_agent(req: ChatRequest):
-    """Chat with the Insurance Agent AI powered by Gemini"""
-    try:
-        aa = FAKE_AA_DB.get(req.user_id)
+def _summarize_coverage(aa: AAData):
+    existing = ", ".join(p.type for p in aa.insurances) or "None"
+    recs = build_recommendations(aa)
 
-        if not aa:
-            return ChatResponse(reply="Cannot find AA data for this user.", history=req.history)
-
-        profile = aa.profile
-        existing = ", ".join(p.type for p in aa.insurances) or "None"
-        recs = build_recommendations(aa)
+    rec_text = "\n".join(
+        f"- {r['type']} ({r['priority']}): {r['reason']}"
+        for r in recs
+    )
+    return existing, rec_text
 
-        rec_text = "\n".join(
-            f"- {r['type']} ({r['priority']}): {r['reason']}"
-            for r in recs
-        )
+@timed("build_prompt")
+def build_chat_prompt(aa: AAData, history: List[Dict[str, str]], message: str, summary: str = "") -> str:
+    profile = aa.profile
+    existing, rec_text = _summarize_coverage(aa)
 
-        system = f"""
+    system = f"""
 You are GenFi's Insurance Advisor AI.
 Use simple language. Be smart, friendly, and helpful.
 
@@ -155,70 +97,250 @@ Recommendations:
 Give short, helpful answers.
 """
 
-        prompt = system + "\nConversation:\n"
-
-        for h in req.history:
-            prompt += f"{h['role'].capitalize()}: {h['content']}\n"
+    parts = [system]
+    if summary:
+        parts.append(f"\nEarlier in this conversation:\n{summary}\n")
+    parts.append("\nConversation:\n")
+    parts.extend(f"{h['role'].capitalize()}: {h['content']}\n" for h in history)
+    parts.append(f"User: {message}\nAI:")
+    return "".join(parts)
+
+def _chat_session(req: ChatRequest) -> Optional[ChatSession]:
+    return chat_sessions.get_or_create(req.user_id, req.session_id) if req.session_id else None
+
+def _record_turn(req: ChatRequest, session: Optional[ChatSession], reply: str) -> List[Dict[str, str]]:
+    """Store the exchange and return the history to send back to the client"""
+    if session:
+        session.add_turn("user", req.message)
+        session.add_turn("assistant", reply)
+        return list(session.turns)
+    return req.history + [
+        {"role": "user", "content": req.message},
+        {"role": "assistant", "content": reply}
+    ]
+
+def offline_reply(aa: AAData, error: Exception = None) -> str:
+    """Rule-based answer used when the LLM is unavailable, fails or can't answer in time"""
+    profile = aa.profile
+    existing, rec_text = _summarize_coverage(aa)
 
-        prompt += f"User: {req.message}\nAI:"
+    if error is not None:
+        # The details go to the log, not to the user
+        if not isinstance(error, LLMUnavailable):
+            print(f"⚠️  LLM call failed for {aa.user_id}, answering from rules: {error}")
+        return f"I'm having trouble connecting to my AI service right now. Here's what I can tell you based on your profile:\n\nAge: {profile.age}, Income: ₹{profile.income:,}\nExisting policies: {existing}\n\n{rec_text if rec_text else 'Your current insurance coverage looks good!'}"
 
-        if GEMINI_AVAILABLE and gemini_model:
-            try:
-                response = gemini_model.generate_content(prompt)
-                reply = response.text
-            except Exception as e:
-                reply = f"I'm having trouble connecting to my AI service right now. Here's what I can tell you based on your profile:\n\nAge: {profile.age}, Income: ₹{profile.income:,}\nExisting policies: {existing}\n\n{rec_text if rec_text else 'Your current insurance coverage looks good!'}\n\nError: {str(e)}"
-        else:
-            reply = f"""I'm currently unable to provide AI-powered responses. Here's a basic analysis:
+    return f"""I'm currently unable to provide AI-powered responses. Here's a basic analysis:
 
 Age: {profile.age}, Income: ₹{profile.income:,}
 Existing policies: {existing}
 
 {rec_text if rec_text else 'Your current insurance coverage looks good!'}"""
 
-        req.history.append({"role": "user", "content": req.message})
-        req.history.append({"role": "assistant", "content": reply})
+def advice_record(aa: AAData, recs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # One model_dump for the whole record instead of .dict() per policy
+    data = aa.model_dump(include={"insurances", "profile"})
+    return {
+        "user_id": aa.user_id,
+        "existing_policies": data["insurances"],
+        "recommendations": recs,
+        "profile": data["profile"]
+    }
+
+def _bulk_advice_page(user_ids: Optional[List[str]], users: Optional[List[AAData]], only_gaps: bool):
+    """NDJSON text for one page of users, plus (users, users with gaps) counts"""
+    if users is None:
+        found = aa_repository.get_users(user_ids)
+        users = [found[user_id] for user_id in user_ids if user_id in found]
+    else:
+        user_ids = [aa.user_id for aa in users]
+
+    lines = {}
+    gaps = 0
+    for aa, recs in zip(users, insurance_rules.recommend_batch(users)):
+        gaps += bool(recs)
+        if recs or not only_gaps:
+            lines[aa.user_id] = dumps(advice_record(aa, recs))
+
+    # Lines follow the requested order; unknown ids get an error line in place
+    found_ids = {aa.user_id for aa in users}
+    text = []
+    for user_id in user_ids:
+        if user_id in lines:
+            text.append(lines[user_id])
+        elif user_id not in found_ids:
+            text.append(dumps({"user_id": user_id, "error": "User not found"}))
+    return b"".join(line + b"\n" for line in text), len(users), gaps
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ---------------------------------------------------
+# ENDPOINTS
+# ---------------------------------------------------
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_insurance_agent(req: ChatRequest):
+    """Chat with the Insurance Agent AI powered by Gemini"""
+    # Time spent loading data and waiting for the session counts against the LLM's budget
+    deadline = deadline_after()
+    try:
+        aa = await asyncio.to_thread(aa_repository.get_user, req.user_id)
 
-        return ChatResponse(reply=reply, history=req.history)
+        if not aa:
+            return ChatResponse(reply="Cannot find AA data for this user.", history=req.history,
+                                session_id=req.session_id)
+
+        session = _chat_session(req)
+        if session:
+            await session.lock.acquire()
+        try:
+            if session:
+                prompt = build_chat_prompt(aa, session.turns, req.message, session.summary)
+            else:
+                prompt = build_chat_prompt(aa, req.history, req.message)
+
+            if llm_client.available:
+                try:
+                    reply = await llm_client.generate(prompt, deadline=deadline)
+                except Exception as e:
+                    reply = offline_reply(aa, error=e)
+            else:
+                reply = offline_reply(aa)
+
+            history = _record_turn(req, session, reply)
+        finally:
+            if session:
+                session.lock.release()
+
+        return ChatResponse(reply=reply, history=history, session_id=req.session_id)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Insurance chat error: {str(e)}")
 
-@router.get("/user/{user_id}")
+@router.post("/chat/stream")
+async def chat_with_insurance_agent_stream(req: ChatRequest):
+    """Streaming variant of /chat: sends `token` SSE events as the model produces
+    text, then a final `done` event carrying the full reply and history"""
+    deadline = deadline_after()
+    aa = await asyncio.to_thread(aa_repository.get_user, req.user_id)
+
+    async def events():
+        # Open the stream right away so the client gets its first byte before the LLM answers
+        yield ": stream-open\n\n"
+
+        if not aa:
+            reply = "Cannot find AA data for this user."
+            yield _sse("token", {"text": reply})
+            yield _sse("done", {"reply": reply, "history": req.history, "session_id": req.session_id})
+            return
+
+        session = _chat_session(req)
+        if session:
+            await session.lock.acquire()
+        try:
+            if session:
+                prompt = build_chat_prompt(aa, session.turns, req.message, session.summary)
+            else:
+                prompt = build_chat_prompt(aa, req.history, req.message)
+
+            chunks = []
+            if llm_client.available:
+                try:
+                    async for chunk in llm_client.stream(prompt, deadline=deadline):
+                        chunks.append(chunk)
+                        yield _sse("token", {"text": chunk})
+                except Exception as e:
+                    fallback = offline_reply(aa, error=e)
+                    chunks.append(fallback if not chunks else "\n\n" + fallback)
+                    yield _sse("token", {"text": chunks[-1]})
+            else:
+                chunks.append(offline_reply(aa))
+                yield _sse("token", {"text": chunks[-1]})
+
+            reply = "".join(chunks)
+            history = _record_turn(req, session, reply)
+        finally:
+            if session:
+                session.lock.release()
+
+        yield _sse("done", {"reply": reply, "history": history, "session_id": req.session_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/user/{user_id}", response_model=AAData)
 def get_user_insurance_data(user_id: str):
     """Get user's insurance and AA data"""
-    user_data = FAKE_AA_DB.get(user_id)
+    user_data = aa_repository.get_user(user_id)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     return user_data
 
-@router.get("/advice")
+@router.get("/advice", response_model=AdviceResponse)
 def get_insurance_advice(user_id: str):
     """Get personalized insurance recommendations"""
     try:
-        aa = FAKE_AA_DB.get(user_id)
+        aa = aa_repository.get_user(user_id)
         if not aa:
             raise HTTPException(status_code=404, detail="User not found")
 
-        recs = build_recommendations(aa)
-        return {
-            "user_id": user_id,
-            "existing_policies": [p.dict() for p in aa.insurances],
-            "recommendations": recs,
-            "profile": aa.profile.dict()
-        }
+        # Models go straight to FastAPI's Pydantic JSON serializer, no intermediate dicts
+        return AdviceResponse(user_id=user_id, existing_policies=aa.insurances,
+                              recommendations=build_recommendations(aa), profile=aa.profile)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advice generation error: {str(e)}")
 
-@router.post("/add-policy")
+@router.post("/advice/bulk")
+async def get_bulk_insurance_advice(req: BulkAdviceRequest):
+    """Coverage-gap report for many users, streamed as NDJSON (one line per user).
+
+    Users come from `user_ids`, or else every user (optionally under `prefix`,
+    starting after `after`, up to `limit`). Pages are fetched only as the client
+    reads, so memory stays at one page however large the report. The last line is
+    a summary whose `last_user_id` can be passed as `after` to resume.
+    """
+    page_size = max(1, min(req.page_size, 5000))
+
+    async def lines():
+        total = gaps = 0
+        last_user_id = req.after
+        if req.user_ids is not None:
+            pages = (req.user_ids[i:i + page_size] for i in range(0, len(req.user_ids), page_size))
+            for ids in pages:
+                chunk, count, with_gaps = await asyncio.to_thread(_bulk_advice_page, ids, None, req.only_gaps)
+                total, gaps, last_user_id = total + count, gaps + with_gaps, ids[-1]
+                if chunk:
+                    yield chunk
+        else:
+            remaining = req.limit
+            while remaining is None or remaining > 0:
+                size = page_size if remaining is None else min(page_size, remaining)
+                users = await asyncio.to_thread(aa_repository.page_users, last_user_id, size, req.prefix)
+                if not users:
+                    break
+                chunk, count, with_gaps = await asyncio.to_thread(_bulk_advice_page, None, users, req.only_gaps)
+                total, gaps, last_user_id = total + count, gaps + with_gaps, users[-1].user_id
+                if remaining is not None:
+                    remaining -= len(users)
+                if chunk:
+                    yield chunk
+
+        yield dumps({"summary": {"users": total, "with_gaps": gaps, "last_user_id": last_user_id}}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/add-policy", response_model=AddPolicyResponse)
 def add_insurance_policy(user_id: str, policy: InsurancePolicy):
     """Add a new insurance policy for a user"""
     try:
-        if user_id not in FAKE_AA_DB:
+        if not aa_repository.add_policy(user_id, policy):
             raise HTTPException(status_code=404, detail="User not found")
-        
-        FAKE_AA_DB[user_id].insurances.append(policy)
-        return {"message": "Policy added successfully", "policy": policy.dict()}
+
+        return AddPolicyResponse(message="Policy added successfully", policy=policy)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding policy: {str(e)}")
 
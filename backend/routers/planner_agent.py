@@ -1,7 +1,50 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from core.metrics import TimedRoute
+from core.planner_engine import ASSUMED_EXPENSE_RATIO, PlanError, create_plan
 
-router = APIRouter(prefix="/api/planner", tags=["Planner Agent"])
+router = APIRouter(prefix="/api/planner", tags=["Planner Agent"], route_class=TimedRoute)
+
+class ExistingLoan(BaseModel):
+    name: Optional[str] = None
+    balance: float = Field(gt=0)
+    annual_rate: float = Field(ge=0)
+    # Current EMI; computed from remaining_months (default 60) when missing
+    emi: Optional[float] = Field(default=None, gt=0)
+    remaining_months: Optional[int] = Field(default=None, gt=0)
+
+class NewLoan(BaseModel):
+    amount: float = Field(gt=0)
+    # Fix the tenure instead of searching for the best one
+    tenure_months: Optional[int] = Field(default=None, gt=0)
+
+class PlanRequest(BaseModel):
+    monthly_income: float
+    monthly_expenses: Optional[float] = None
+    credit_score: int = 650
+    loans: List[ExistingLoan] = []
+    new_loan: Optional[NewLoan] = None
+    goal: Literal["min_interest", "fastest", "min_emi"] = "min_interest"
+    max_emi_ratio: float = Field(default=0.5, gt=0, le=1)
+    include_schedule: bool = True
 
 @router.post("/create")
-def create_plan(goal: dict):
-    return {"message": "Plan created successfully", "plan": {}}
+def create_plan_endpoint(req: PlanRequest):
+    """Search tenures, score-band rates, prepayments and avalanche/snowball orderings for the best repayment plan"""
+    if req.monthly_income <= 0:
+        raise HTTPException(status_code=400, detail="monthly_income must be positive")
+
+    expenses = req.monthly_expenses if req.monthly_expenses is not None else req.monthly_income * ASSUMED_EXPENSE_RATIO
+    try:
+        plan = create_plan(
+            req.monthly_income, expenses, req.credit_score,
+            loans=[loan.model_dump() for loan in req.loans],
+            new_loan=req.new_loan.model_dump() if req.new_loan else None,
+            goal=req.goal,
+            max_emi_ratio=req.max_emi_ratio,
+            include_schedule=req.include_schedule
+        )
+    except PlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Plan created successfully", "plan": plan}
@@ -0,0 +1,70 @@
+"""
+Import-time budget check for the API
+
+Imports `main` in a fresh interpreter with `-X importtime` and fails if the
+cumulative import time is over budget, or if any dependency that is meant
+to load lazily (Gemini SDK, pandas, scikit-learn, ...) was pulled in eagerly.
+
+Usage (from backend/):
+    python scripts/check_import_time.py [--budget-ms 1000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ["google.generativeai", "grpc", "pandas", "sklearn", "joblib", "xgboost"]
+
+
+def measure_imports(module: str = "main"):
+    """Return {module_name: cumulative_us} for a cold import of `module`"""
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "import-time-check")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1000)))
+    args = parser.parse_args()
+
+    timings = measure_imports()
+    total_ms = timings.get("main", 0) / 1000
+    eager = sorted(m for m in timings if any(m == lazy or m.startswith(lazy + ".") for lazy in LAZY_MODULES))
+    slowest = sorted(timings.items(), key=lambda kv: kv[1], reverse=True)[:10]
+
+    print(f"import main: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, us in slowest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print("❌ Import time over budget")
+        failed = True
+    if eager:
+        print(f"❌ Lazy dependencies imported eagerly: {', '.join(sorted(set(m.split('.')[0] for m in eager)))}")
+        failed = True
+    if not failed:
+        print("✅ Import time within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,260 @@
+"""
+Account Aggregator (AA) FI data parsing
+
+AA statement dumps for users with years of UPI history run to tens of MB of
+JSON. Instead of json.load-ing the whole payload, StreamingAAParser is fed
+the response chunk by chunk, locates every "Transaction" array and decodes
+one transaction object at a time, so memory stays bounded by the chunk and
+batch size, not by the statement length.
+
+Two output modes sit on top of it:
+  stream_aa_transactions  batches of BankTransaction / UPITransaction records
+  stream_aa_columns       batches of NumPy columns (no object per row)
+
+UPI debits become UPITransaction (receiver = payee); every other row is a
+BankTransaction with type "credit" or "debit".
+"""
+
+import codecs
+import json
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from models.bank_txn import BankTransaction
+from models.upi_txn import UPITransaction
+
+CHUNK_SIZE = 64 * 1024
+MAX_OBJECT_BYTES = 1 << 20
+
+# Type codes used by the columnar mode
+TXN_CREDIT = 0
+TXN_DEBIT = 1
+TXN_UPI = 2
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Both the ReBIT "Transactions": {"Transaction": [...]} layout and a flat "transactions": [...]
+_ARRAY_KEY = re.compile(r'(?<!\\)"transactions?"\s*:\s*\[', re.IGNORECASE)
+_SEPARATORS = re.compile(r'[\s,]*')
+_KEY_TAIL = 64
+
+Source = Union[str, bytes, Iterable[Union[str, bytes]], Any]
+
+
+class StreamingAAParser:
+    """Push parser: feed() raw chunks, get back the transaction dicts completed so far"""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self._started = False
+
+    def feed(self, chunk: Union[str, bytes]) -> List[Dict[str, Any]]:
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        rows = self.feed(self._decoder.decode(b"", final=True))
+        if self._in_array and self._buf[self._pos:].strip():
+            raise ValueError("Truncated AA payload: transaction array is not closed")
+        return rows
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        rows = []
+        buf = self._buf
+        while True:
+            if not self._in_array and not self._seek_array():
+                return rows
+
+            pos = _SEPARATORS.match(buf, self._pos).end()
+            if pos == len(buf):
+                self._pos = pos
+                return rows
+            if buf[pos] == "]":
+                self._pos = pos + 1
+                self._in_array = False
+                continue
+
+            try:
+                obj, self._pos = self._json.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Almost always an object cut by the chunk boundary; wait for more input
+                if len(buf) - pos > MAX_OBJECT_BYTES:
+                    raise ValueError(f"Malformed AA transaction near offset {pos}")
+                self._pos = pos
+                return rows
+
+            if isinstance(obj, dict):
+                rows.append(obj)
+
+    def _seek_array(self) -> bool:
+        buf = self._buf
+        if not self._started:
+            start = _SEPARATORS.match(buf, self._pos).end()
+            if start == len(buf):
+                return False
+            self._started = True
+            # A bare top-level list (like data/bank_mock.json) is itself the transaction array
+            if buf[start] == "[":
+                self._pos, self._in_array = start + 1, True
+                return True
+
+        match = _ARRAY_KEY.search(buf, self._pos)
+        if match is None:
+            # Keep a short tail in case a key is split across chunks
+            self._pos = max(self._pos, len(buf) - _KEY_TAIL)
+            return False
+        self._pos, self._in_array = match.end(), True
+        return True
+
+
+def _iter_chunks(source: Source, chunk_size: int) -> Iterator[Union[str, bytes]]:
+    if isinstance(source, (str, bytes)):
+        if isinstance(source, str) and not source.lstrip().startswith(("{", "[")):
+            # A file path
+            with open(source, "rb") as f:
+                yield from iter(lambda: f.read(chunk_size), b"")
+            return
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        yield from source
+
+
+def iter_aa_transactions(source: Source, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Raw transaction dicts from a file path, JSON text, file object or chunk iterable"""
+    parser = StreamingAAParser()
+    for chunk in _iter_chunks(source, chunk_size):
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def _upi_receiver(raw: Dict[str, Any]) -> Optional[str]:
+    """Payee of a UPI debit, or None if the row isn't a UPI payment"""
+    receiver = raw.get("receiver")
+    if receiver:
+        return receiver
+
+    mode = str(raw.get("mode", "")).upper()
+    narration = str(raw.get("narration", ""))
+    if mode != "UPI" and not narration.upper().startswith("UPI"):
+        return None
+
+    # e.g. "UPI/DR/312345678901/SWIGGY/YESB/swiggy@yesbank/Payment"
+    for part in narration.split("/")[1:]:
+        part = part.strip()
+        if part and not part.isdigit() and part.upper() not in ("DR", "CR", "P2M", "P2A"):
+            return part
+    return "UNKNOWN"
+
+
+def normalize_transaction(raw: Dict[str, Any], seq: int):
+    """(kind, id, amount, date, receiver) for one raw AA or mock transaction"""
+    day = str(raw.get("date") or raw.get("valueDate") or raw.get("transactionTimestamp", ""))[:10]
+    txn_date = date.fromisoformat(day)
+    amount = float(raw.get("amount", 0))
+
+    txn_id = raw.get("id", raw.get("txnId"))
+    if not isinstance(txn_id, int):
+        txn_id = int(txn_id) if isinstance(txn_id, str) and txn_id.isdigit() else seq
+
+    kind = TXN_CREDIT if str(raw.get("type", "")).lower() == "credit" else TXN_DEBIT
+    receiver = _upi_receiver(raw) if kind == TXN_DEBIT else None
+    if receiver is not None:
+        kind = TXN_UPI
+    return kind, txn_id, amount, txn_date, receiver
+
+
+def _to_record(kind, txn_id, amount, txn_date, receiver):
+    # Fields are already normalized above, so skip per-row validation
+    if kind == TXN_UPI:
+        return UPITransaction.model_construct(id=txn_id, amount=amount, receiver=receiver, date=txn_date)
+    return BankTransaction.model_construct(id=txn_id, amount=amount,
+                                           type="credit" if kind == TXN_CREDIT else "debit", date=txn_date)
+
+
+def stream_aa_transactions(source: Source, batch_size: int = 1000,
+                           chunk_size: int = CHUNK_SIZE) -> Iterator[List[Union[BankTransaction, UPITransaction]]]:
+    """Yield lists of BankTransaction / UPITransaction, at most `batch_size` each"""
+    batch = []
+    for seq, raw in enumerate(iter_aa_transactions(source, chunk_size), 1):
+        batch.append(_to_record(*normalize_transaction(raw, seq)))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_aa_columns(source: Source, batch_size: int = 65536,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield column batches: id, amount, day (days since 1970-01-01), type code and receiver code.
+
+    Receivers are dictionary-encoded; `receivers` in each batch is the vocabulary so
+    far (receiver code -1 means not a UPI payment).
+    """
+    receivers: List[str] = []
+    receiver_codes: Dict[str, int] = {}
+    ids, amounts, days, kinds, payees = [], [], [], [], []
+
+    def flush():
+        batch = {
+            "id": np.array(ids, dtype=np.int64),
+            "amount": np.array(amounts, dtype=np.float64),
+            "day": np.array(days, dtype=np.int32),
+            "type": np.array(kinds, dtype=np.int8),
+            "receiver": np.array(payees, dtype=np.int32),
+            "receivers": list(receivers)
+        }
+        for column in (ids, amounts, days, kinds, payees):
+            column.clear()
+        return batch
+
+    for seq, raw in enumerate(iter_aa_transactions(source, chunk_size), 1):
+        kind, txn_id, amount, txn_date, receiver = normalize_transaction(raw, seq)
+        if receiver is None:
+            code = -1
+        else:
+            code = receiver_codes.get(receiver)
+            if code is None:
+                code = receiver_codes[receiver] = len(receivers)
+                receivers.append(receiver)
+
+        ids.append(txn_id)
+        amounts.append(amount)
+        days.append(txn_date.toordinal() - EPOCH_ORDINAL)
+        kinds.append(kind)
+        payees.append(code)
+        if len(ids) >= batch_size:
+            yield flush()
+    if ids:
+        yield flush()
+
+
+def _transaction_arrays(node) -> Iterator[list]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if isinstance(value, list) and key.lower() in ("transaction", "transactions"):
+                yield value
+            else:
+                yield from _transaction_arrays(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _transaction_arrays(item)
+
+
 def parse_aa_response(response: dict):
-    return {"transactions": []}
+    """Parse an already-decoded AA response into transaction records"""
+    rows = [raw for array in _transaction_arrays(response) for raw in array if isinstance(raw, dict)]
+    return {"transactions": [_to_record(*normalize_transaction(raw, seq)) for seq, raw in enumerate(rows, 1)]}
@@ -0,0 +1,293 @@
+"""
+Persistent AA user repository (SQLite)
+
+Replaces the per-process FAKE_AA_DB dict: users, profiles, policies and
+accounts live in one SQLite database shared by every uvicorn worker on the
+host, so writes such as /add-policy survive restarts and millions of users
+don't have to fit in RAM.
+
+- DATABASE_URL selects the file (sqlite:///relative.db, sqlite:////abs.db or
+  sqlite://:memory:); anything else falls back to data/genfi.db.
+- Connections come from a small pool; WAL mode lets readers run alongside a
+  writer. Every query is a constant SQL string, so each connection's
+  statement cache reuses the prepared statement instead of re-parsing it.
+- A TTLCache sits in front of user lookups and is invalidated on writes.
+  Its TTL bounds how stale another worker's cached copy can be.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import config
+from core.cache import TTLCache
+from models.insurance import AAData, InsurancePolicy, Profile
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "genfi.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id    TEXT PRIMARY KEY,
+    age        INTEGER NOT NULL,
+    dependents INTEGER NOT NULL,
+    income     INTEGER NOT NULL,
+    city       TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS policies (
+    id       INTEGER PRIMARY KEY,
+    user_id  TEXT NOT NULL REFERENCES users(user_id),
+    type     TEXT NOT NULL,
+    coverage INTEGER NOT NULL,
+    premium  INTEGER NOT NULL,
+    provider TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_policies_user_type ON policies(user_id, type);
+CREATE INDEX IF NOT EXISTS idx_policies_type ON policies(type);
+
+CREATE TABLE IF NOT EXISTS accounts (
+    id      INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    data    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_user ON accounts(user_id);
+"""
+
+SELECT_USER = "SELECT age, dependents, income, city FROM users WHERE user_id = ?"
+SELECT_POLICIES = "SELECT type, coverage, premium, provider FROM policies WHERE user_id = ? ORDER BY id"
+SELECT_ACCOUNTS = "SELECT data FROM accounts WHERE user_id = ? ORDER BY id"
+USER_EXISTS = "SELECT 1 FROM users WHERE user_id = ?"
+UPSERT_USER = """INSERT INTO users (user_id, age, dependents, income, city) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET age = excluded.age, dependents = excluded.dependents,
+income = excluded.income, city = excluded.city"""
+DELETE_POLICIES = "DELETE FROM policies WHERE user_id = ?"
+DELETE_ACCOUNTS = "DELETE FROM accounts WHERE user_id = ?"
+INSERT_POLICY = "INSERT INTO policies (user_id, type, coverage, premium, provider) VALUES (?, ?, ?, ?, ?)"
+INSERT_ACCOUNT = "INSERT INTO accounts (user_id, data) VALUES (?, ?)"
+PAGE_USER_IDS = "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?"
+PAGE_USERS = """SELECT user_id, age, dependents, income, city FROM users
+WHERE user_id > ? AND user_id >= ? AND user_id < ? ORDER BY user_id LIMIT ?"""
+RANGE_POLICIES = """SELECT user_id, type, coverage, premium, provider FROM policies
+WHERE user_id >= ? AND user_id <= ? ORDER BY user_id, id"""
+RANGE_ACCOUNTS = "SELECT user_id, data FROM accounts WHERE user_id >= ? AND user_id <= ? ORDER BY user_id, id"
+COUNT_USERS = "SELECT COUNT(*) FROM users"
+
+# The demo user that used to live in FAKE_AA_DB
+SEED_USERS = [
+    AAData(
+        user_id="user1",
+        profile=Profile(age=23, dependents=0, income=600000, city="mumbai"),
+        insurances=[
+            InsurancePolicy(
+                type="health",
+                coverage=300000,
+                premium=12000,
+                provider="care health"
+            ),
+            InsurancePolicy(
+                type="life",
+                coverage=5000000,      # example 50 lakh term plan
+                premium=9000,          # example premium
+                provider="lic"
+            )
+        ],
+        accounts=[{"type": "savings", "balance": 80000}]
+    )
+]
+
+
+def parse_database_url(url: Optional[str]) -> str:
+    """SQLite path for DATABASE_URL"""
+    if not url or not url.startswith("sqlite:"):
+        if url:
+            print(f"⚠️  DATABASE_URL {url.split(':', 1)[0]!r} is not a sqlite URL, using {DEFAULT_DB_PATH}")
+        return DEFAULT_DB_PATH
+
+    path = url[len("sqlite:"):]
+    if path in ("", "//", "///", "//:memory:", "///:memory:"):
+        return ":memory:"
+    # sqlite:///relative.db -> relative.db, sqlite:////abs/path.db -> /abs/path.db
+    return path[3:] if path.startswith("///") else path.lstrip("/")
+
+
+class AARepository:
+    def __init__(self, database_url: Optional[str] = None, pool_size: int = 4,
+                 cache_size: int = 10000, cache_ttl: float = 30.0, seed: bool = True):
+        self.path = parse_database_url(database_url)
+        # Every connection to ":memory:" would be its own empty database
+        self.pool_size = 1 if self.path == ":memory:" else pool_size
+        self.seed = seed
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, cached_statements=128)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        with self._lock:
+            if self._initialized:
+                return
+            conn.executescript(SCHEMA)
+            if self.seed and conn.execute(COUNT_USERS).fetchone()[0] == 0:
+                self._write_users(conn, SEED_USERS)
+            conn.commit()
+            self._initialized = True
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self.pool_size
+                if grow:
+                    self._opened += 1
+            conn = self._connect() if grow else self._pool.get()
+
+        if not self._initialized:
+            self._initialize(conn)
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def get_user(self, user_id: str) -> Optional[AAData]:
+        """Read-through cached lookup of one user's AA data"""
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        with self.connection() as conn:
+            user = self._read_user(conn, user_id)
+        if user is not None:
+            self.cache.set(user_id, user)
+        return user
+
+    def get_users(self, user_ids: Iterable[str]) -> Dict[str, AAData]:
+        """Lookup several users on one connection; unknown ids are left out"""
+        found, missing = {}, []
+        for user_id in user_ids:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                found[user_id] = cached
+            else:
+                missing.append(user_id)
+
+        if missing:
+            with self.connection() as conn:
+                for user_id in missing:
+                    user = self._read_user(conn, user_id)
+                    if user is not None:
+                        self.cache.set(user_id, user)
+                        found[user_id] = user
+        return found
+
+    def _read_user(self, conn: sqlite3.Connection, user_id: str) -> Optional[AAData]:
+        row = conn.execute(SELECT_USER, (user_id,)).fetchone()
+        if row is None:
+            return None
+
+        age, dependents, income, city = row
+        return AAData(
+            user_id=user_id,
+            profile=Profile(age=age, dependents=dependents, income=income, city=city),
+            insurances=[InsurancePolicy(type=t, coverage=c, premium=p, provider=pr)
+                        for t, c, p, pr in conn.execute(SELECT_POLICIES, (user_id,))],
+            accounts=[json.loads(data) for (data,) in conn.execute(SELECT_ACCOUNTS, (user_id,))]
+        )
+
+    def user_ids(self, after: str = "", limit: int = 1000) -> List[str]:
+        """Keyset-paginated user ids in primary-key order"""
+        with self.connection() as conn:
+            return [user_id for (user_id,) in conn.execute(PAGE_USER_IDS, (after, limit))]
+
+    def page_users(self, after: str = "", limit: int = 500, prefix: str = "") -> List[AAData]:
+        """Keyset-paginated full user records: three range queries per page, not three per user"""
+        # A prefix is a primary-key range: [prefix, prefix + highest code point)
+        upper = prefix + "\U0010ffff"
+        with self.connection() as conn:
+            rows = conn.execute(PAGE_USERS, (after, prefix, upper, limit)).fetchall()
+            if not rows:
+                return []
+            first, last = rows[0][0], rows[-1][0]
+            policies: Dict[str, list] = {}
+            for user_id, t, c, p, pr in conn.execute(RANGE_POLICIES, (first, last)):
+                policies.setdefault(user_id, []).append(InsurancePolicy(type=t, coverage=c, premium=p, provider=pr))
+            accounts: Dict[str, list] = {}
+            for user_id, data in conn.execute(RANGE_ACCOUNTS, (first, last)):
+                accounts.setdefault(user_id, []).append(json.loads(data))
+
+        return [
+            AAData(user_id=user_id,
+                   profile=Profile(age=age, dependents=dependents, income=income, city=city),
+                   insurances=policies.get(user_id, []),
+                   accounts=accounts.get(user_id, []))
+            for user_id, age, dependents, income, city in rows
+        ]
+
+    def count_users(self) -> int:
+        with self.connection() as conn:
+            return conn.execute(COUNT_USERS).fetchone()[0]
+
+    def add_policy(self, user_id: str, policy: InsurancePolicy) -> bool:
+        """Append a policy; False if the user doesn't exist"""
+        with self.connection() as conn:
+            with conn:
+                if conn.execute(USER_EXISTS, (user_id,)).fetchone() is None:
+                    return False
+                conn.execute(INSERT_POLICY, (user_id, policy.type, policy.coverage, policy.premium,
+                                             policy.provider))
+        self.cache.pop(user_id)
+        return True
+
+    def upsert_users(self, users: Iterable[AAData]):
+        """Insert or replace users with their policies and accounts, in one transaction"""
+        users = list(users)
+        with self.connection() as conn:
+            with conn:
+                self._write_users(conn, users)
+        for user in users:
+            self.cache.pop(user.user_id)
+
+    def _write_users(self, conn: sqlite3.Connection, users: List[AAData]):
+        ids = [(u.user_id,) for u in users]
+        conn.executemany(DELETE_POLICIES, ids)
+        conn.executemany(DELETE_ACCOUNTS, ids)
+        conn.executemany(UPSERT_USER, [(u.user_id, u.profile.age, u.profile.dependents, u.profile.income,
+                                        u.profile.city) for u in users])
+        conn.executemany(INSERT_POLICY, [(u.user_id, p.type, p.coverage, p.premium, p.provider)
+                                         for u in users for p in u.insurances])
+        conn.executemany(INSERT_ACCOUNT, [(u.user_id, json.dumps(a)) for u in users for a in u.accounts])
+
+    def close(self):
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        self._opened = 0
+        self._initialized = False
+
+
+aa_repository = AARepository(
+    config.DATABASE_URL,
+    pool_size=config.DB_POOL_SIZE,
+    cache_size=config.AA_CACHE_SIZE,
+    cache_ttl=config.AA_CACHE_TTL_SECONDS
+)
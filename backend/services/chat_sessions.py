@@ -0,0 +1,94 @@
+"""
+Server-held chat sessions for the insurance agent
+
+Sessions are keyed by (user_id, session_id) so clients only send the new
+message each turn. Once a session's transcript exceeds its token budget the
+oldest turns are folded into a short running summary, which keeps the prompt
+(and so the LLM latency) flat however long the conversation runs.
+"""
+
+import asyncio
+from typing import Dict, List
+
+from config import config
+from core.cache import TTLCache
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+class ChatSession:
+    """Rolling transcript of one conversation"""
+
+    SUMMARY_NOTE_CHARS = 120
+
+    def __init__(self, user_id: str, session_id: str, token_budget: int):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.token_budget = token_budget
+        self.turns: List[Dict[str, str]] = []
+        self.summary_notes: List[str] = []
+        self.tokens = 0
+        # Turns of the same session are answered one at a time
+        self.lock = asyncio.Lock()
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_notes)
+
+    def add_turn(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+        self.tokens += estimate_tokens(content)
+        self._compact()
+
+    def _compact(self):
+        # Always keep the latest exchange verbatim
+        while self.tokens > self.token_budget and len(self.turns) > 2:
+            turn = self.turns.pop(0)
+            self.tokens -= estimate_tokens(turn["content"])
+            self._fold_into_summary(turn)
+
+    def _fold_into_summary(self, turn: Dict[str, str]):
+        text = " ".join(turn["content"].split())
+        if len(text) > self.SUMMARY_NOTE_CHARS:
+            text = text[:self.SUMMARY_NOTE_CHARS].rstrip() + "..."
+        who = "User asked" if turn["role"] == "user" else "Advisor said"
+        note = f"- {who}: {text}"
+        self.summary_notes.append(note)
+        self.tokens += estimate_tokens(note)
+
+        # The summary itself is capped at a quarter of the budget; the oldest notes go first
+        summary_tokens = sum(estimate_tokens(n) for n in self.summary_notes)
+        while self.summary_notes and summary_tokens > self.token_budget // 4:
+            dropped = self.summary_notes.pop(0)
+            summary_tokens -= estimate_tokens(dropped)
+            self.tokens -= estimate_tokens(dropped)
+
+
+class ChatSessionStore:
+    """Bounded, expiring map of (user_id, session_id) -> ChatSession"""
+
+    def __init__(self, max_sessions: int, ttl: float, token_budget: int):
+        self.token_budget = token_budget
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=ttl)
+
+    def get_or_create(self, user_id: str, session_id: str) -> ChatSession:
+        key = (user_id, session_id)
+        session = self._sessions.get(key)
+        if session is None:
+            session = ChatSession(user_id, session_id, self.token_budget)
+        # Re-setting refreshes the idle TTL on every turn
+        self._sessions.set(key, session)
+        return session
+
+    def drop(self, user_id: str, session_id: str):
+        self._sessions.pop((user_id, session_id))
+
+
+chat_sessions = ChatSessionStore(
+    max_sessions=config.CHAT_SESSION_MAX,
+    ttl=config.CHAT_SESSION_TTL_SECONDS,
+    token_budget=config.CHAT_SESSION_TOKEN_BUDGET,
+)
@@ -0,0 +1,449 @@
+"""
+Async LLM client shared by the insurance chat and explain agents
+
+All calls go through one pooled Gemini client, bounded by a concurrency
+limit and a per-call timeout, so a burst of slow LLM calls never ties up
+uvicorn's threadpool. Completions are cached per normalized prompt and
+model, and identical prompts in flight at the same time share a single
+upstream call. Set LLM_BACKEND=fake to use a local stand-in that
+only injects latency (useful for tests and load runs).
+
+Latency stays bounded whatever the upstream does:
+- callers pass a request deadline (deadline_after()) and every call is cut
+  to the time left; with less than LLM_MIN_CALL_SECONDS left the call is
+  not made at all,
+- a circuit breaker opens after LLM_BREAKER_FAILURES consecutive failures
+  or timeouts and fails calls immediately for LLM_BREAKER_RESET_SECONDS,
+  then lets one probe call through,
+- with LLM_HEDGE_AFTER_SECONDS set, a call with no reply by then (or one
+  that failed) gets a backup request and the first good reply wins.
+In each of these cases LLMUnavailable/LLMError is raised quickly, so the
+caller can answer from its rule-based fallback.
+
+google.generativeai is slow to import, so the Gemini backend is only built
+on the first call or by the /ready warm-up, on a worker thread either way;
+`available` only checks configuration and never loads it.
+"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional
+
+from config import config
+from core.cache import TTLCache, canonical_hash
+from core.metrics import LLM_CACHE, LLM_CIRCUIT_STATE, LLM_REQUESTS, stage
+
+
+class LLMError(Exception):
+    """Raised when the LLM backend is unavailable, fails or times out"""
+
+
+class LLMUnavailable(LLMError):
+    """Raised without calling upstream: the circuit is open or the deadline is too close"""
+
+
+def deadline_after(seconds: Optional[float] = None) -> float:
+    """Monotonic deadline `seconds` (default LLM_DEADLINE_SECONDS) from now, for LLMClient calls"""
+    return time.monotonic() + (config.LLM_DEADLINE_SECONDS if seconds is None else seconds)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker around the upstream LLM
+
+    closed: calls go through; `failure_threshold` failures in a row open it.
+    open: calls are refused for `reset_timeout` seconds, then one probe call
+    is let through (half_open); its success closes the breaker, its failure
+    opens it again. Only used from the event loop, so it needs no lock.
+    """
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        LLM_CIRCUIT_STATE.set(value=0)
+
+    def allow(self) -> bool:
+        """Whether an upstream call may be made now"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._transition("half_open")
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """An admitted call ended without a verdict (e.g. the caller went away)"""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != "closed":
+            self._transition("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._transition("open")
+
+    def _transition(self, state: str):
+        self.state = state
+        LLM_CIRCUIT_STATE.set(value=self.STATES[state])
+        if state == "open":
+            print(f"🔴 LLM circuit open after {self.failures} consecutive failures; "
+                  f"answering from fallbacks for {self.reset_timeout:g}s")
+        elif state == "half_open":
+            print("🟡 LLM circuit half-open, probing the upstream")
+        else:
+            print("🟢 LLM circuit closed")
+
+    def stats(self) -> dict:
+        retry_in = self.reset_timeout - (time.monotonic() - self._opened_at) if self.state == "open" else 0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(max(retry_in, 0), 1)
+        }
+
+
+class GeminiBackend:
+    """Gemini via google-generativeai's async (grpc.aio) transport"""
+
+    MODEL_NAMES = ("gemini-pro", "gemini-1.5-flash")
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.model_name = None
+        self._model = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def available(self) -> bool:
+        """Configured and not known to have failed; does not import the SDK"""
+        return not self._loaded or self._model is not None
+
+    @property
+    def model(self):
+        if not self._loaded:
+            self.load()
+        return self._model
+
+    def load(self):
+        """Import the SDK and build the model; blocking, so call it off the event loop"""
+        with self._lock:
+            if self._loaded:
+                return
+
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key)
+
+            for name in self.MODEL_NAMES:
+                try:
+                    self._model = genai.GenerativeModel(name)
+                    self.model_name = name
+                    print(f"✅ Gemini model {name} initialized successfully")
+                    break
+                except Exception as e:
+                    print(f"⚠️  Gemini model {name} initialization error: {e}")
+
+            if self._model is None:
+                print("❌ All Gemini models failed")
+            self._loaded = True
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        # The model keeps a single async client, so every call reuses the same channel
+        response = await self.model.generate_content_async(
+            prompt, request_options={"timeout": timeout}
+        )
+        return response.text
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        async for chunk in response:
+            yield chunk.text
+
+
+class FakeLLMBackend:
+    """Deterministic local stand-in for Gemini that only adds latency"""
+
+    model_name = "fake-llm"
+
+    def __init__(self, latency_ms: float = 200):
+        self.latency = latency_ms / 1000
+        self.model = self
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        # First token after a quarter of the latency, the rest spread over the remainder
+        words = self._reply(prompt).split(" ")
+        await asyncio.sleep(self.latency / 4)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.latency * 0.75 / len(words))
+            yield word if i == 0 else " " + word
+
+    @staticmethod
+    def _reply(prompt: str) -> str:
+        question = next((line[6:] for line in reversed(prompt.splitlines()) if line.startswith("User: ")), "")
+        topic = f" about '{question[:200]}'" if question else ""
+        return f"[fake-llm] Thanks for your question{topic}. Here is a short, helpful answer."
+
+
+class LLMClient:
+    """Concurrency-limited, deadline-bounded async front for an LLM backend"""
+
+    def __init__(self, backend, max_concurrency: int = 16, timeout: float = 20.0,
+                 cache_size: int = 1024, cache_ttl: float = 600.0, min_call_seconds: float = 0.3,
+                 hedge_after: float = 0.0, max_hedges: int = 1, breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.min_call_seconds = min_call_seconds
+        self.hedge_after = hedge_after
+        self.max_hedges = max_hedges
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def available(self) -> bool:
+        """Whether calls are worth attempting; a configuration check that never loads the backend"""
+        return self.backend is not None and getattr(self.backend, "available", True)
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self.backend.model_name if self.backend else None
+
+    def _cache_key(self, prompt: str) -> str:
+        return canonical_hash(self.model_name, " ".join(prompt.split()))
+
+    async def warm(self):
+        """Load the backend off the event loop; returns whether it is usable"""
+        if self.backend is not None and not getattr(self.backend, "loaded", True):
+            await asyncio.to_thread(self.backend.load)
+        return self.available
+
+    def cache_stats(self) -> dict:
+        return {**self._cache.stats(), "inflight": len(self._inflight)}
+
+    def _budget(self, timeout: Optional[float], deadline: Optional[float]) -> float:
+        """Seconds this call may take: the per-call timeout, cut short by the request deadline"""
+        timeout = timeout or self.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        if timeout < self.min_call_seconds:
+            LLM_REQUESTS.inc(self.model_name, "deadline")
+            raise LLMUnavailable(f"Only {max(timeout, 0):.2f}s left before the deadline")
+        return timeout
+
+    def _admit(self):
+        """Refuse a new upstream call while the circuit is open"""
+        if not self.breaker.allow():
+            LLM_REQUESTS.inc(self.model_name, "short_circuit")
+            raise LLMUnavailable("LLM circuit open")
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None,
+                       deadline: Optional[float] = None) -> str:
+        """Generate a completion for `prompt`, raising LLMError on failure or timeout
+
+        `deadline` is a time.monotonic() timestamp (see deadline_after()) the
+        reply is needed by; the call is cut short, or not made, to meet it.
+        """
+        if not await self.warm():
+            raise LLMError("LLM backend not available")
+
+        key = self._cache_key(prompt)
+        cached = self._cache.get(key)
+        LLM_CACHE.inc("miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+        timeout = self._budget(timeout, deadline)
+        # Single-flight: concurrent identical prompts await the same upstream call.
+        # The call runs as its own task so one caller disconnecting doesn't cancel it for the rest.
+        task = self._inflight.get(key)
+        if task is None:
+            self._admit()
+            task = asyncio.ensure_future(self._generate_uncached(prompt, timeout))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_inflight(key, t))
+        try:
+            # Callers joining an in-flight call still only wait as long as their own budget
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise LLMError(f"LLM call timed out after {timeout:.2f}s")
+
+    def _finish_inflight(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._cache.set(key, task.result())
+
+    async def _generate_uncached(self, prompt: str, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        outcome = "error"
+        try:
+            # Waiting for a slot counts against the budget too, but says nothing about the upstream
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                outcome = "no_slot"
+                raise LLMUnavailable(f"No LLM slot free within {timeout:.2f}s")
+            try:
+                with stage("llm_call", model=self.model_name):
+                    reply = await self._hedged(prompt, deadline)
+            finally:
+                self._semaphore.release()
+            outcome = "ok"
+            return reply
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise LLMError(f"LLM call timed out after {timeout:.2f}s")
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(str(e)) from e
+        finally:
+            LLM_REQUESTS.inc(self.model_name, outcome)
+            if outcome == "ok":
+                self.breaker.record_success()
+            elif outcome == "no_slot":
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+
+    async def _hedged(self, prompt: str, deadline: float) -> str:
+        """First good reply from the upstream, sending a backup request when the first is slow or fails"""
+        def attempt():
+            return asyncio.ensure_future(self.backend.generate(prompt, max(deadline - time.monotonic(), 0.001)))
+
+        pending = {attempt()}
+        hedges = self.max_hedges if self.hedge_after > 0 else 0
+        error = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                wait = min(remaining, self.hedge_after) if hedges else remaining
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                # No reply within hedge_after, or every attempt so far failed
+                slow_or_failed = not done or not pending
+                if hedges and slow_or_failed and deadline - time.monotonic() >= self.min_call_seconds:
+                    hedges -= 1
+                    LLM_REQUESTS.inc(self.model_name, "hedge")
+                    pending.add(attempt())
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield completion chunks as they arrive
+
+        `timeout` bounds the wait for each chunk; the first chunk must also
+        arrive before `deadline`. Once text is flowing the reply is not cut off.
+        """
+        if not await self.warm():
+            raise LLMError("LLM backend not available")
+
+        key = self._cache_key(prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        wait = self._budget(timeout, deadline)
+        timeout = timeout or self.timeout
+        self._admit()
+        parts = []
+        failed = None
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), wait)
+            except asyncio.TimeoutError:
+                LLM_REQUESTS.inc(self.model_name, "no_slot")
+                raise LLMUnavailable(f"No LLM slot free within {wait:.2f}s")
+            try:
+                chunks = self.backend.stream(prompt, timeout).__aiter__()
+                while True:
+                    # The first chunk has to beat the deadline, later ones only the stall timeout
+                    chunk_timeout = timeout if parts else wait
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), chunk_timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise LLMError(f"LLM stream stalled for more than {chunk_timeout:.2f}s")
+                    except Exception as e:
+                        raise LLMError(str(e)) from e
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+            finally:
+                self._semaphore.release()
+            failed = False
+        except LLMUnavailable:
+            raise
+        except LLMError:
+            failed = True
+            raise
+        finally:
+            if failed is None:
+                # No free slot, or the consumer went away mid-stream; neither says anything about the upstream
+                self.breaker.release()
+            elif failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+        if parts:
+            self._cache.set(key, "".join(parts))
+
+
+def _create_backend():
+    if config.LLM_BACKEND == "fake":
+        return FakeLLMBackend(latency_ms=config.LLM_FAKE_LATENCY_MS)
+    if not config.GEMINI_API_KEY:
+        return None
+    return GeminiBackend(config.GEMINI_API_KEY)
+
+
+llm_client = LLMClient(
+    _create_backend(),
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    timeout=config.LLM_TIMEOUT_SECONDS,
+    cache_size=config.LLM_CACHE_SIZE,
+    cache_ttl=config.LLM_CACHE_TTL_SECONDS,
+    min_call_seconds=config.LLM_MIN_CALL_SECONDS,
+    hedge_after=config.LLM_HEDGE_AFTER_SECONDS,
+    breaker=CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_RESET_SECONDS),
+)
@@ -1,5 +1,11 @@
-def generate_explanation(score_data):
-    prompt = f"""
+from core.metrics import stage
+from services.llm_client import deadline_after, llm_client
+
+MOCK_EXPLANATION = "Your score shows strong payment behaviour but high EMI ratio. Try saving ₹5k more monthly to reduce risk."
+
+async def generate_explanation(score_data):
+    with stage("build_prompt"):
+        prompt = f"""
     You are GenFi, an AI financial mentor.
     Given {score_data}, explain in plain English:
     1. What this score means,
@@ -7,4 +13,10 @@ def generate_explanation(score_data):
     3. Suggest one repayment strategy.
     """
     # Return mock text for demo if API unavailable
-    return "Your score shows strong payment behaviour but high EMI ratio. Try saving ₹5k more monthly to reduce risk."
+    if not llm_client.available:
+        return MOCK_EXPLANATION
+    try:
+        return await llm_client.generate(prompt, deadline=deadline_after())
+    except Exception as e:
+        print(f"LLM explanation error: {e}")
+        return MOCK_EXPLANATION